@@ -28,8 +28,10 @@ class ActivityAdmin(admin.ModelAdmin):
 
 @admin.register(Goal)
 class GoalAdmin(admin.ModelAdmin):
-    list_display = ('user', 'goal_type', 'target_value', 'period', 'activity_type', 'is_active', 'start_date', 'end_date')
+    list_display = ('user', 'goal_type', 'target_value', 'percentage', 'period', 'activity_type', 'is_active', 'start_date', 'end_date')
     list_filter = ('goal_type', 'period', 'activity_type', 'is_active', 'created_at')
     search_fields = ('user__username', 'goal_type', 'activity_type')
     date_hierarchy = 'start_date'
-    ordering = ('-created_at',)
\ No newline at end of file
+    ordering = ('-created_at',)
+    # Maintained by activities.progress
+    readonly_fields = ('current_value', 'percentage', 'completed_at')
\ No newline at end of file
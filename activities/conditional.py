@@ -0,0 +1,81 @@
+"""
+Conditional GET support for per-user read endpoints.
+
+The ETag and Last-Modified of a response are derived from the caller's
+UserDataVersion, so a request carrying a matching If-None-Match (or, without
+one, a recent enough If-Modified-Since) is answered with 304 after a single
+primary key lookup, before the view runs any query of its own. Views whose
+body also depends on something else, such as today's date, name it with
+``vary`` so that it becomes part of the ETag.
+"""
+from functools import partial, wraps
+
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import versions
+
+
+def _etag(user_id, version, variant=''):
+    if variant:
+        return f'"{user_id}-{version}-{variant}"'
+    return f'"{user_id}-{version}"'
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        # Weak comparison, as required for If-None-Match
+        return '*' in etags or any(tag.removeprefix('W/') == etag for tag in etags)
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return bool(last_modified and if_modified_since and int(last_modified.timestamp()) <= if_modified_since)
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # The body depends on who is asking
+    patch_vary_headers(response, ('Authorization', 'Cookie'))
+
+
+def _applies(request):
+    user = request.user
+    return request.method == 'GET' and not hasattr(user, 'developer') and user.is_authenticated
+
+
+def _not_modified_response(etag, last_modified):
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    _set_validators(response, etag, last_modified)
+    return response
+
+
+def user_data_conditional(view=None, *, vary=None):
+    """
+    Add ETag/Last-Modified to successful GET responses of ``view`` and
+    answer matching conditional requests with 304. Apply it below
+    @api_view, or with method_decorator on a view method.
+    ``vary(request)`` returns a string that is added to the ETag, for views
+    whose body changes without a write (e.g. with the current date).
+    """
+    if view is None:
+        return partial(user_data_conditional, vary=vary)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _applies(request):
+            return view(request, *args, **kwargs)
+
+        version, last_modified = versions.for_request(request)
+        etag = _etag(request.user.id, version, vary(request) if vary else '')
+        if _not_modified(request, etag, last_modified):
+            return _not_modified_response(etag, last_modified)
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            _set_validators(response, etag, last_modified)
+        return response
+    return wrapper
@@ -0,0 +1,145 @@
+"""
+Additive counter tables.
+
+DailyActivityRollup and LeaderboardEntry are both "counter" tables: one row
+per key holding a count plus a few sums, changed by adding deltas. This
+module applies a batch of deltas to such a table.
+
+On backends with INSERT ... ON CONFLICT (SQLite, PostgreSQL) every key goes
+into one multi-row upsert that adds the deltas to existing rows, followed by
+one DELETE of the rows whose count dropped to zero, so a write costs the
+same two statements however many keys it touches. Elsewhere, small batches
+(single activity writes) use one atomic UPDATE ... SET col = col + delta per
+key; large batches (bulk ingestion) read the affected rows once and replace
+them with a DELETE plus a multi-row INSERT.
+"""
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F, Q
+
+# Above this many keys, a read-modify-write round is cheaper than per-key UPDATEs
+BULK_THRESHOLD = 16
+
+
+def _key_filter(key_fields, key):
+    return dict(zip(key_fields, key))
+
+
+def _apply_one(model, key_fields, value_fields, key, delta):
+    rows = model.objects.filter(**_key_filter(key_fields, key))
+    increments = {field: F(field) + amount for field, amount in zip(value_fields, delta)}
+    updated = rows.update(**increments)
+    count = delta[0]
+    if not updated and count > 0:
+        try:
+            with transaction.atomic():
+                model.objects.create(
+                    **_key_filter(key_fields, key),
+                    **dict(zip(value_fields, delta)),
+                )
+        except IntegrityError:
+            # Another request created the row first; add to it instead
+            rows.update(**increments)
+    elif count < 0:
+        rows.filter(**{f'{value_fields[0]}__lte': 0}).delete()
+
+
+def _apply_bulk(model, key_fields, value_fields, deltas):
+    # Narrow the read to the rows that can match, then match keys in Python
+    narrowing = Q()
+    for position, field in enumerate(key_fields):
+        narrowing &= Q(**{f'{field}__in': {key[position] for key in deltas}})
+    existing = {
+        tuple(getattr(row, field) for field in key_fields): row
+        for row in model.objects.select_for_update().filter(narrowing)
+    }
+
+    # Rows are replaced rather than bulk_update()d: a DELETE by pk plus a
+    # multi-row INSERT is far cheaper than the CASE WHEN statement Django
+    # builds for bulk_update, and nothing references these rows by pk.
+    to_replace, to_create = [], []
+    for key, delta in deltas.items():
+        row = existing.get(key)
+        if row is None:
+            if delta[0] > 0:
+                to_create.append(model(
+                    **_key_filter(key_fields, key),
+                    **dict(zip(value_fields, delta)),
+                ))
+            continue
+        to_replace.append(row.pk)
+        for field, amount in zip(value_fields, delta):
+            setattr(row, field, getattr(row, field) + amount)
+        if getattr(row, value_fields[0]) > 0:
+            row.pk = None
+            to_create.append(row)
+
+    if to_replace:
+        for start in range(0, len(to_replace), 500):
+            model.objects.filter(pk__in=to_replace[start:start + 500]).delete()
+    if to_create:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(to_create, batch_size=500)
+        except IntegrityError:
+            # A concurrent writer created some of these keys; add our (merged)
+            # values to whatever is there now, one key at a time
+            for row in to_create:
+                key = tuple(getattr(row, field) for field in key_fields)
+                values = tuple(getattr(row, field) for field in value_fields)
+                _apply_one(model, key_fields, value_fields, key, values)
+
+
+def _upsert(connection, model, key_fields, value_fields, deltas):
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    fields = [model._meta.get_field(name) for name in (*key_fields, *value_fields)]
+    key_columns = [quote(field.column) for field in fields[:len(key_fields)]]
+    value_columns = [quote(field.column) for field in fields[len(key_fields):]]
+    placeholders = '(%s)' % ', '.join(['%s'] * len(fields))
+    sql = 'INSERT INTO {table} ({columns}) VALUES {{rows}} ON CONFLICT ({keys}) DO UPDATE SET {sums}'.format(
+        table=table,
+        columns=', '.join(key_columns + value_columns),
+        keys=', '.join(key_columns),
+        sums=', '.join(f'{column} = {table}.{column} + EXCLUDED.{column}' for column in value_columns),
+    )
+
+    rows = [
+        [field.get_db_prep_save(value, connection) for field, value in zip(fields, (*key, *delta))]
+        for key, delta in deltas.items()
+    ]
+    batch_size = connection.ops.bulk_batch_size(fields, rows) or len(rows)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                sql.format(rows=', '.join([placeholders] * len(batch))),
+                [param for row in batch for param in row],
+            )
+
+    # Keys whose count did not grow may have reached zero (or been inserted
+    # empty because the row was already gone)
+    emptied = [key for key, delta in deltas.items() if delta[0] <= 0]
+    for start in range(0, len(emptied), batch_size):
+        matching = Q()
+        for key in emptied[start:start + batch_size]:
+            matching |= Q(**_key_filter(key_fields, key))
+        model.objects.using(connection.alias).filter(matching, **{f'{value_fields[0]}__lte': 0}).delete()
+
+
+def apply(model, key_fields, value_fields, deltas):
+    """
+    Add ``deltas`` ({key tuple: value tuple}) to ``model``. The first value
+    field is the row count; rows whose count drops to zero are deleted.
+    """
+    if not deltas:
+        return
+    connection = connections[router.db_for_write(model)]
+    if connection.features.supports_update_conflicts_with_target:
+        _upsert(connection, model, key_fields, value_fields, deltas)
+        return
+    if len(deltas) > BULK_THRESHOLD:
+        with transaction.atomic():
+            _apply_bulk(model, key_fields, value_fields, deltas)
+        return
+    for key, delta in deltas.items():
+        _apply_one(model, key_fields, value_fields, key, delta)
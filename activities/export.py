@@ -0,0 +1,70 @@
+"""
+Streaming activity export.
+
+Rows are read with a server-side ``.iterator()`` as ``values()`` dicts,
+converted by ActivityRowSerializer (the same output as ActivitySerializer)
+and encoded straight to NDJSON or CSV text, so memory use does not grow with
+the number of exported activities.
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+
+from .serializers import ActivityRowSerializer
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Encoded rows are joined into one chunk per this many rows before yielding,
+# which keeps the number of writes to the client low
+ROWS_PER_CHUNK = 500
+
+
+def _rows(row_serializer, queryset, chunk_size):
+    chunk_size = chunk_size or getattr(settings, 'ACTIVITY_EXPORT_CHUNK_SIZE', 2000)
+    queryset = row_serializer.project(queryset.order_by('-date', '-created_at', '-id'))
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield row_serializer.to_representation(row)
+
+
+def iter_ndjson(queryset, username, chunk_size=None, fields=None):
+    """Yield the activities in ``queryset`` as NDJSON text chunks."""
+    lines = []
+    row_serializer = ActivityRowSerializer(username=username, fields=fields)
+    for row in _rows(row_serializer, queryset, chunk_size):
+        lines.append(json.dumps(row))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def iter_csv(queryset, username, chunk_size=None, fields=None):
+    """Yield the activities in ``queryset`` as CSV text chunks with a header row."""
+    row_serializer = ActivityRowSerializer(username=username, fields=fields)
+    header = [name for name, _, _ in row_serializer.fields]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    rows = 0
+    for row in _rows(row_serializer, queryset, chunk_size):
+        writer.writerow(['' if row[field] is None else row[field] for field in header])
+        rows += 1
+        if rows >= ROWS_PER_CHUNK:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue()
+
+
+def stream(export_format, queryset, username, chunk_size=None, fields=None):
+    """Return the text chunk iterator for ``export_format`` ('ndjson' or 'csv')."""
+    if export_format == 'csv':
+        return iter_csv(queryset, username, chunk_size, fields)
+    return iter_ndjson(queryset, username, chunk_size, fields)
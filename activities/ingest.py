@@ -0,0 +1,297 @@
+"""
+Bulk activity ingestion.
+
+Request bodies are parsed incrementally from the request stream (JSON array,
+NDJSON or CSV), validated row by row with one reused ActivityCreateSerializer
+and inserted in chunks. Invalid rows are reported with their row number and
+never abort the rest of the upload. Each chunk commits in its own transaction
+together with its updates to the derived stores, so the database write lock
+is only held while a chunk is written, never while the (possibly slow)
+request body is read.
+
+Chunks are written with one executemany() of a plain INSERT built from the
+validated values rather than with bulk_create(): preparing every value
+through the model fields cost more than validating the rows. The validated
+values already have the field types, so only dates and decimals go through
+the backend's adapters; columns a row leaves out get the model default.
+"""
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import SNAPSHOT_FIELDS, Activity, ActivitySnapshot
+from .serializers import ActivityCreateSerializer
+from .signals import sync_derived_data
+
+READ_SIZE = 64 * 1024
+
+JSON_TYPES = ('application/json',)
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+CSV_TYPES = ('text/csv', 'application/csv')
+
+
+class BodyParseError(Exception):
+    """The body is malformed in a way that prevents reading further rows."""
+
+
+def _iter_text(stream):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            break
+        try:
+            yield decoder.decode(chunk)
+        except UnicodeDecodeError:
+            raise BodyParseError('Request body is not valid UTF-8.')
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def _iter_lines(stream):
+    """Yield lines, keeping their line endings, from a byte stream."""
+    pending = ''
+    for text in _iter_text(stream):
+        pending += text
+        lines = pending.splitlines(keepends=True)
+        # The last piece may be an incomplete line; keep it for the next chunk
+        pending = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        yield from lines
+    if pending:
+        yield pending
+
+
+def iter_json_array(stream):
+    """Yield the elements of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    chunks = _iter_text(stream)
+    buffer = ''
+    position = 0
+    exhausted = False
+    started = False
+    values = 0
+    expect_value = True
+
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n':
+            position += 1
+        if position >= len(buffer):
+            if exhausted:
+                raise BodyParseError('Unexpected end of JSON array.')
+            buffer, position = '', 0
+            try:
+                buffer = next(chunks)
+            except StopIteration:
+                exhausted = True
+            continue
+
+        char = buffer[position]
+        if not started:
+            if char != '[':
+                raise BodyParseError('Expected a JSON array of activities.')
+            started = True
+            position += 1
+        elif char == ']' and (not expect_value or values == 0):
+            return
+        elif char == ',' and not expect_value:
+            expect_value = True
+            position += 1
+        elif not expect_value:
+            raise BodyParseError(f"Expected ',' or ']' after array element {values}.")
+        else:
+            start = position
+            try:
+                value, position = decoder.raw_decode(buffer, start)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise BodyParseError(f'Malformed JSON in array element {values + 1}.')
+                # The element most likely spans a chunk boundary; read more
+                buffer, position = buffer[position:], 0
+                try:
+                    buffer += next(chunks)
+                except StopIteration:
+                    exhausted = True
+                continue
+            if position == len(buffer) and not exhausted and not isinstance(value, (dict, list)):
+                # A bare scalar at the end of a chunk may continue in the next
+                buffer, position = buffer[start:], 0
+                try:
+                    buffer += next(chunks)
+                except StopIteration:
+                    exhausted = True
+                continue
+            values += 1
+            expect_value = False
+            yield value
+
+
+def iter_ndjson(stream):
+    """Yield one decoded value (or a JSON error) per non-blank line."""
+    for line in _iter_lines(stream):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield serializers.ValidationError({'non_field_errors': [f'Invalid JSON: {exc.msg}']})
+
+
+def iter_csv(stream):
+    """Yield one dict per CSV data row, keyed by the header row."""
+    for row in csv.DictReader(_iter_lines(stream)):
+        # Empty cells mean "not provided", so optional fields keep their defaults
+        yield {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+def row_iterator(content_type, stream):
+    """Return the row iterator for ``content_type`` or None if unsupported."""
+    content_type = content_type.split(';')[0].strip().lower()
+    if content_type in JSON_TYPES:
+        return iter_json_array(stream)
+    if content_type in NDJSON_TYPES:
+        return iter_ndjson(stream)
+    if content_type in CSV_TYPES:
+        return iter_csv(stream)
+    return None
+
+
+def _adapter(field, connection):
+    """Return the backend adapter for a validated value of ``field``, if it needs one."""
+    if isinstance(field, models.DecimalField):
+        return lambda value: connection.ops.adapt_decimalfield_value(
+            value, field.max_digits, field.decimal_places
+        )
+    if isinstance(field, models.DateField) and not isinstance(field, models.DateTimeField):
+        return connection.ops.adapt_datefield_value
+    return None
+
+
+class BulkIngestor:
+    """
+    Validate and insert activity rows for one user.
+    With ``save=False`` rows are only validated (used for API key demos).
+    """
+
+    def __init__(self, user_id, chunk_size=None, save=True):
+        self.user_id = user_id
+        self.chunk_size = chunk_size or getattr(settings, 'BULK_INGEST_CHUNK_SIZE', 5000)
+        self.max_rows = getattr(settings, 'BULK_INGEST_MAX_ROWS', 100000)
+        self.max_errors = getattr(settings, 'BULK_INGEST_MAX_ERRORS', 1000)
+        self.save = save
+        # One serializer instance: its bound fields are built once and reused
+        self.serializer = ActivityCreateSerializer()
+        self.rows = 0
+        self.valid = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.pending = []
+        # Column values for fields a row leaves out, as Activity(**row) would set
+        self.defaults = {
+            field.name: field.get_default()
+            for field in Activity._meta.concrete_fields
+            if field.name in self.serializer.fields
+        }
+
+    def add_error(self, row_number, detail):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row_number, 'errors': detail})
+
+    def validate(self, row_number, row):
+        if isinstance(row, serializers.ValidationError):
+            self.add_error(row_number, row.detail)
+            return
+        if not isinstance(row, dict):
+            self.add_error(row_number, {'non_field_errors': ['Expected an object.']})
+            return
+        try:
+            validated = self.serializer.run_validation(row)
+        except serializers.ValidationError as exc:
+            self.add_error(row_number, exc.detail)
+            return
+        self.pending.append({**self.defaults, **validated})
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.valid += len(self.pending)
+        if self.save:
+            with transaction.atomic():
+                self.insert(self.pending)
+                # No model instances are saved, so no post_save handlers run
+                sync_derived_data(added=[
+                    ActivitySnapshot._make(
+                        self.user_id if name == 'user_id' else row[name] for name in SNAPSHOT_FIELDS
+                    )
+                    for row in self.pending
+                ])
+            self.created += len(self.pending)
+        self.pending = []
+
+    def insert(self, rows):
+        """Insert validated ``rows`` (with every column present) in one statement."""
+        connection = connections[router.db_for_write(Activity)]
+        now = timezone.now()
+        chunk_values = {'user': self.user_id, 'created_at': now, 'updated_at': now}
+        fields = [field for field in Activity._meta.concrete_fields if not field.primary_key]
+        columns = [
+            (None, None, field.get_db_prep_save(chunk_values[field.name], connection))
+            if field.name in chunk_values
+            else (field.name, _adapter(field, connection), None)
+            for field in fields
+        ]
+        params = [
+            [
+                value if name is None
+                else row[name] if adapt is None or row[name] is None
+                else adapt(row[name])
+                for name, adapt, value in columns
+            ]
+            for row in rows
+        ]
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+            quote(Activity._meta.db_table),
+            ', '.join(quote(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+    def consume(self, rows):
+        try:
+            for row in rows:
+                if self.rows >= self.max_rows:
+                    raise BodyParseError(f'Too many rows; the limit is {self.max_rows}.')
+                self.rows += 1
+                self.validate(self.rows, row)
+        except BodyParseError as exc:
+            return exc
+        finally:
+            self.flush()
+        return None
+
+    def ingest(self, rows):
+        """Consume ``rows``; raises BodyParseError after saving the good rows."""
+        error = self.consume(rows)
+        if error is not None:
+            raise error
+
+    def summary(self):
+        return {
+            'received': self.rows,
+            'valid': self.valid + len(self.pending),
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
@@ -0,0 +1,111 @@
+"""
+Materialized leaderboard.
+
+LeaderboardEntry rows hold per-user distance and calories totals for the
+all-time, weekly and monthly windows, both across all activities and per
+activity_type. They are updated from the same per-day deltas that drive the
+daily rollups, so a read is a top-K walk over one index.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters
+from .models import DailyActivityRollup, LeaderboardEntry
+
+WINDOWS = [choice for choice, _ in LeaderboardEntry.WINDOW_CHOICES]
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+
+def period_start(window, day):
+    """Return the first day of the ``window`` period containing ``day``."""
+    if window == 'week':
+        return day - timedelta(days=day.weekday())
+    if window == 'month':
+        return day.replace(day=1)
+    return LeaderboardEntry.ALL_TIME_START
+
+
+def _fan_out(deltas):
+    """
+    Expand per-(user, date, activity_type) deltas into per-entry deltas for
+    every window and for both the typed and the all-activities boards.
+    """
+    entries = defaultdict(lambda: [0, Decimal('0'), 0])
+    for (user_id, day, activity_type), (count, _duration, distance, calories) in deltas.items():
+        for window in WINDOWS:
+            start = period_start(window, day)
+            for board in ('', activity_type):
+                entry = entries[(user_id, window, start, board)]
+                entry[0] += count
+                entry[1] += distance
+                entry[2] += calories
+    return entries
+
+
+def apply_deltas(deltas):
+    """Apply rollups.collect_deltas() output to the leaderboard entries."""
+    counters.apply(
+        LeaderboardEntry,
+        ('user_id', 'window', 'period_start', 'activity_type'),
+        ('activity_count', 'total_distance', 'total_calories'),
+        _fan_out(deltas),
+    )
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """
+    Recompute leaderboard entries from the daily rollups.
+    Returns the number of entries written.
+    """
+    rollups = DailyActivityRollup.objects.all()
+    entries = LeaderboardEntry.objects.all()
+    if user_ids is not None:
+        rollups = rollups.filter(user_id__in=user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+
+    deltas = {
+        (row.user_id, row.date, row.activity_type): (
+            row.activity_count, row.total_duration, row.total_distance, row.total_calories
+        )
+        for row in rollups.order_by().iterator(chunk_size=batch_size)
+    }
+    new_entries = [
+        LeaderboardEntry(
+            user_id=user_id,
+            window=window,
+            period_start=start,
+            activity_type=activity_type,
+            activity_count=count,
+            total_distance=distance,
+            total_calories=calories,
+        )
+        for (user_id, window, start, activity_type), (count, distance, calories)
+        in _fan_out(deltas).items()
+    ]
+    with transaction.atomic():
+        entries.delete()
+        LeaderboardEntry.objects.bulk_create(new_entries, batch_size=batch_size)
+    return len(new_entries)
+
+
+def top(metric, window='all', day=None, activity_type='', limit=DEFAULT_LIMIT):
+    """
+    Return the top ``limit`` (username, total) pairs for ``metric``, which is
+    either 'distance' or 'calories', for the period containing ``day``
+    (today by default).
+    """
+    field = f'total_{metric}'
+    start = period_start(window, day or timezone.localdate())
+    return list(
+        LeaderboardEntry.objects.filter(
+            window=window,
+            period_start=start,
+            activity_type=activity_type,
+            **{f'{field}__gt': 0},
+        ).order_by(f'-{field}').values_list('user__username', field)[:limit]
+    )
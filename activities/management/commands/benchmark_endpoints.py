@@ -0,0 +1,392 @@
+import json
+import platform
+import statistics
+import time
+from datetime import date, timedelta
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.urls import resolve
+from rest_framework.test import APIClient
+
+import activities.urls
+import users.urls
+from activities import sync
+from activities.management.utils import percentile, throwaway_database
+from activities.models import Activity, Goal
+from users.management.commands.seed_data import seed_chunk
+from users.models import Developer
+from users.revocation import RefreshToken
+
+User = get_user_model()
+
+PASSWORDS = ('bench-pass-123', 'bench-pass-456')
+
+# Metrics compared against --baseline; latency is only flagged when it also
+# grows by more than --min-delta-ms, so sub-millisecond noise never fails a run
+LATENCY_METRICS = ('p50_ms', 'p95_ms')
+
+
+class Endpoint:
+    """
+    One benchmarked request. ``prepare(iteration)`` runs untimed before each
+    request and may return ``url`` keyword arguments, ``data`` and ``auth``
+    overrides, for requests that consume what they touch (deletes, key
+    rotation, password changes).
+    """
+
+    def __init__(self, name, method, url, data=None, auth='user', content_type=None, prepare=None):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.data = data
+        self.auth = auth
+        self.content_type = content_type
+        self.prepare = prepare
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every endpoint in activities.urls and users.urls on a seeded '
+        'throwaway database: latency percentiles, SQL queries/time and response size'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Users to seed')
+        parser.add_argument('--activities-per-user', type=int, default=500, help='Average activities per user')
+        parser.add_argument('--iterations', type=int, default=30, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per endpoint')
+        parser.add_argument('--only', default='', help='Only run endpoints whose name contains this')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument(
+            '--baseline',
+            help='JSON file from an earlier run; exit non-zero if any endpoint regressed',
+        )
+        parser.add_argument(
+            '--max-regression', type=float, default=25.0,
+            help='Allowed p50/p95 latency growth over the baseline, in percent',
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=1.0,
+            help='Ignore latency growth smaller than this many milliseconds',
+        )
+        parser.add_argument(
+            '--response-cache', action='store_true',
+            help='Leave the response cache on (by default every read runs its queries)',
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be positive.')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as handle:
+                baseline = json.load(handle)
+
+        overrides = override_settings(
+            RATE_LIMIT_ENABLED=False,
+            RESPONSE_CACHE_ENABLED=options['response_cache'],
+            # Everything was just seeded; incremental syncs would resend it all
+            SYNC_SETTLE_SECONDS=0,
+        )
+        with throwaway_database(), overrides:
+            context = self.seed(options)
+            endpoints = self.endpoints(context)
+            self.check_coverage(endpoints)
+            results = self.run(context, endpoints, options)
+
+        report = {
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'users': options['users'],
+                'activities': context['activities'],
+                'iterations': options['iterations'],
+                'response_cache': options['response_cache'],
+            },
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+                handle.write('\n')
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = self.compare(results, baseline.get('endpoints', {}), options)
+            if regressions:
+                raise CommandError(f'{regressions} endpoint metric(s) regressed against the baseline.')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def seed(self, options):
+        seed_options = {
+            'seed': options['seed'],
+            'batch_size': 5000,
+            'prefix': 'bench_user_',
+            'activities_per_user': options['activities_per_user'],
+            'days': 365,
+            'goals_per_user': len(Goal.PERIOD_CHOICES),
+            'skip_derived': False,
+        }
+        self.stdout.write(
+            f"Seeding {options['users']} users with ~{options['activities_per_user']} activities each..."
+        )
+        _, activities, _ = seed_chunk(0, options['users'], seed_options, make_password(PASSWORDS[0]))
+
+        user = User.objects.get(username='bench_user_0')
+        developer = Developer.objects.create(email='bench_dev@example.com', name='Bench Developer')
+        return {
+            'user': user,
+            'token': str(RefreshToken.for_user(user).access_token),
+            'developer': developer,
+            'activity_id': Activity.objects.filter(user=user).values_list('pk', flat=True).first(),
+            'goal_id': Goal.objects.filter(user=user).values_list('pk', flat=True).first(),
+            'activities': activities,
+        }
+
+    def endpoints(self, context):
+        user = context['user']
+        today = date.today()
+        start = today - timedelta(days=90)
+
+        def fresh_activity(iteration):
+            activity = Activity.objects.create(
+                user=user, activity_type='yoga', duration=20, date=today,
+            )
+            return {'url': {'pk': activity.pk}}
+
+        def fresh_goal(iteration):
+            goal = Goal.objects.create(
+                user=user, goal_type='duration', target_value=100, period='weekly',
+                start_date=today, end_date=today + timedelta(days=7),
+            )
+            return {'url': {'pk': goal.pk}}
+
+        def fresh_account(iteration):
+            doomed = User.objects.create(
+                username=f'bench_doomed_{iteration}', email=f'bench_doomed_{iteration}@example.com',
+            )
+            return {'auth': f'Bearer {RefreshToken.for_user(doomed).access_token}'}
+
+        def fresh_session(iteration):
+            refresh = RefreshToken.for_user(user)
+            return {
+                'auth': f'Bearer {refresh.access_token}',
+                'data': {'refresh': str(refresh)},
+            }
+
+        def new_user(iteration):
+            return {'data': {
+                'username': f'bench_new_{iteration}', 'email': f'bench_new_{iteration}@example.com',
+                'password': PASSWORDS[0], 'password_confirm': PASSWORDS[0],
+            }}
+
+        def swap_password(iteration):
+            old, new = PASSWORDS[iteration % 2], PASSWORDS[(iteration + 1) % 2]
+            return {'data': {'old_password': old, 'new_password': new, 'confirm_password': new}}
+
+        def current_key(iteration):
+            context['developer'].refresh_from_db(fields=['api_key'])
+            return {'data': {
+                'current_api_key': context['developer'].api_key,
+                'email': context['developer'].email,
+            }}
+
+        def sync_token(iteration):
+            # Taken once, so every incremental sync covers the same changes
+            if 'sync_token' not in context:
+                context['sync_token'] = sync.changes(user)['sync_token']
+            return {'url': {'token': context['sync_token']}}
+
+        bulk_rows = '\n'.join(
+            json.dumps({'activity_type': 'running', 'duration': 30 + i, 'date': str(start)})
+            for i in range(100)
+        )
+        dashboard = [
+            {'url': '/api/activities/metrics/'},
+            {'url': '/api/activities/history/'},
+            {'url': '/api/activities/goals/'},
+            {'url': '/api/activities/leaderboard/'},
+        ]
+        goal = {
+            'goal_type': 'distance', 'target_value': '80', 'period': 'monthly',
+            'start_date': str(start), 'end_date': str(start + timedelta(days=30)),
+        }
+
+        return [
+            Endpoint('activity list', 'get', '/api/activities/'),
+            Endpoint('activity list filtered', 'get', f'/api/activities/?activity_type=running&start_date={start}'),
+            Endpoint('activity list sparse', 'get', '/api/activities/?fields=date,activity_type,duration'),
+            Endpoint('activity list (api key)', 'get', '/api/activities/', auth='developer'),
+            Endpoint('activity create', 'post', '/api/activities/', data={
+                'activity_type': 'walking', 'duration': 25, 'date': str(today),
+            }),
+            Endpoint('activity bulk create', 'post', '/api/activities/bulk/', data=bulk_rows,
+                     content_type='application/x-ndjson'),
+            Endpoint('activity detail', 'get', '/api/activities/{pk}/', prepare=lambda i: {
+                'url': {'pk': context['activity_id']},
+            }),
+            Endpoint('activity update', 'patch', '/api/activities/{pk}/', data={'duration': 42},
+                     prepare=lambda i: {'url': {'pk': context['activity_id']}}),
+            Endpoint('activity delete', 'delete', '/api/activities/{pk}/', prepare=fresh_activity),
+            Endpoint('goal list', 'get', '/api/activities/goals/'),
+            Endpoint('goal create', 'post', '/api/activities/goals/', data=goal),
+            Endpoint('goal detail', 'get', '/api/activities/goals/{pk}/', prepare=lambda i: {
+                'url': {'pk': context['goal_id']},
+            }),
+            Endpoint('goal update', 'put', '/api/activities/goals/{pk}/', data=goal,
+                     prepare=lambda i: {'url': {'pk': context['goal_id']}}),
+            Endpoint('goal delete', 'delete', '/api/activities/goals/{pk}/', prepare=fresh_goal),
+            Endpoint('metrics', 'get', '/api/activities/metrics/'),
+            Endpoint('metrics filtered', 'get', f'/api/activities/metrics/?activity_type=running&start_date={start}'),
+            Endpoint('trends weekly', 'get', '/api/activities/trends/'),
+            Endpoint('trends monthly by type', 'get', '/api/activities/trends/?bucket=month&by_type=true'),
+            Endpoint('history', 'get', '/api/activities/history/'),
+            Endpoint('history cursor', 'get', '/api/activities/history/?cursor=&page_size=50'),
+            Endpoint('export ndjson', 'get', '/api/activities/export/'),
+            Endpoint('export csv', 'get', '/api/activities/export/?export_format=csv'),
+            Endpoint('leaderboard', 'get', '/api/activities/leaderboard/'),
+            Endpoint('leaderboard week', 'get', '/api/activities/leaderboard/?window=week&activity_type=running'),
+            Endpoint('sync full', 'get', '/api/activities/sync/'),
+            Endpoint('sync incremental', 'get', '/api/activities/sync/?sync_token={token}', prepare=sync_token),
+            Endpoint('batch dashboard', 'post', '/api/batch/', data={'requests': dashboard}),
+            Endpoint('batch dashboard parallel', 'post', '/api/batch/',
+                     data={'requests': dashboard, 'parallel': True}),
+            Endpoint('register', 'post', '/api/auth/register/', auth=None, prepare=new_user),
+            Endpoint('profile', 'get', '/api/auth/profile/'),
+            Endpoint('profile update', 'patch', '/api/auth/profile/', data={'first_name': 'Bench'}),
+            Endpoint('change password', 'post', '/api/auth/change-password/', prepare=swap_password),
+            Endpoint('delete account', 'delete', '/api/auth/delete-account/', prepare=fresh_account),
+            Endpoint('token refresh', 'post', '/api/token/refresh/', auth=None, prepare=fresh_session),
+            Endpoint('logout', 'post', '/api/auth/logout/', prepare=fresh_session),
+            Endpoint('revoke sessions', 'post', '/api/auth/revoke-sessions/', prepare=fresh_account),
+            Endpoint('developer info', 'get', '/api/developers/info/', auth=None),
+            Endpoint('regenerate api key', 'post', '/api/developers/regenerate-key/', auth=None,
+                     prepare=current_key),
+        ]
+
+    def check_coverage(self, endpoints):
+        """Fail when a reachable route in activities.urls or users.urls has no benchmark."""
+        covered = {
+            resolve(endpoint.url.split('?')[0].format(pk=1)).func for endpoint in endpoints
+        }
+        missing = []
+        for urlpatterns in (activities.urls.urlpatterns, users.urls.urlpatterns):
+            routes = set()
+            for pattern in urlpatterns:
+                route = str(pattern.pattern)
+                if route in routes:
+                    # An earlier pattern with the same route answers every request
+                    self.stdout.write(self.style.WARNING(
+                        f'Skipping {pattern.callback.__name__} at {route}: shadowed by an earlier route'
+                    ))
+                elif pattern.callback not in covered:
+                    missing.append(route)
+                routes.add(route)
+        if missing:
+            raise CommandError(f'No benchmark for: {", ".join(missing)}')
+
+    def run(self, context, endpoints, options):
+        client = APIClient()
+        auth = {
+            'user': f"Bearer {context['token']}",
+            'developer': f"Api-Key {context['developer'].api_key}",
+            None: None,
+        }
+
+        self.stdout.write(
+            f'{"endpoint":<28}{"status":>7}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+            f'{"queries":>9}{"sql ms":>9}{"bytes":>10}'
+        )
+        results = {}
+        iteration = 0
+        for endpoint in endpoints:
+            if options['only'] not in endpoint.name:
+                continue
+            timings = []
+            for timed in [False] * options['warmup'] + [True] * options['iterations']:
+                iteration += 1
+                sample = self.request(client, endpoint, auth, iteration)
+                if timed:
+                    timings.append(sample)
+                    status_code, _, queries, sql_time, size = sample
+
+            latencies = sorted(elapsed for _, elapsed, _, _, _ in timings)
+            results[endpoint.name] = {
+                'method': endpoint.method.upper(),
+                'url': endpoint.url,
+                'status': status_code,
+                'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+                'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+                'queries': queries,
+                'sql_ms': round(statistics.median(sample[3] for sample in timings) * 1000, 3),
+                'bytes': size,
+            }
+            row = results[endpoint.name]
+            self.stdout.write(
+                f'{endpoint.name:<28}{status_code:>7}{row["p50_ms"]:>9.2f}{row["p95_ms"]:>9.2f}'
+                f'{row["p99_ms"]:>9.2f}{queries:>9}{row["sql_ms"]:>9.2f}{size:>10}'
+            )
+            if status_code >= 400:
+                raise CommandError(f'{endpoint.method.upper()} {endpoint.url} returned {status_code}')
+        return results
+
+    def request(self, client, endpoint, auth, iteration):
+        """Send one request; return (status, seconds, queries, sql seconds, bytes)."""
+        prepared = endpoint.prepare(iteration) if endpoint.prepare else {}
+        url = endpoint.url.format(**prepared.get('url', {}))
+        data = prepared.get('data', endpoint.data)
+        authorization = prepared.get('auth', auth[endpoint.auth])
+        extra = {'HTTP_AUTHORIZATION': authorization} if authorization else {}
+        if endpoint.content_type:
+            extra['content_type'] = endpoint.content_type
+        elif endpoint.method != 'get':
+            extra['format'] = 'json'
+
+        queries = 0
+        sql_time = 0.0
+
+        def record(execute, sql, params, many, context):
+            nonlocal queries, sql_time
+            began = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries += 1
+                sql_time += time.perf_counter() - began
+
+        with connection.execute_wrapper(record):
+            began = time.perf_counter()
+            response = getattr(client, endpoint.method)(url, data, **extra)
+            if response.streaming:
+                body = b''.join(response.streaming_content)
+            else:
+                body = response.content
+            elapsed = time.perf_counter() - began
+        return response.status_code, elapsed, queries, sql_time, len(body)
+
+    def compare(self, results, baseline, options):
+        regressions = 0
+        for name, row in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            problems = []
+            for metric in LATENCY_METRICS:
+                limit = before[metric] * (1 + options['max_regression'] / 100)
+                if row[metric] > limit and row[metric] - before[metric] > options['min_delta_ms']:
+                    problems.append(f'{metric} {before[metric]:.2f} -> {row[metric]:.2f}')
+            if row['queries'] > before['queries']:
+                problems.append(f"queries {before['queries']} -> {row['queries']}")
+            if problems:
+                regressions += len(problems)
+                self.stdout.write(self.style.ERROR(f'{name}: {", ".join(problems)}'))
+        return regressions
@@ -0,0 +1,132 @@
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from activities.management.utils import percentile, throwaway_database
+from activities.models import Activity, Goal
+from users.management.commands.seed_data import seed_chunk
+from users.token_user_cache import token_user_cache
+
+User = get_user_model()
+
+MODES = (
+    ('model', False),
+    ('stateless', True),
+)
+
+
+def requests(context):
+    """(name, url) of every benchmarked JWT request."""
+    start = (date.today() - timedelta(days=90)).isoformat()
+    return [
+        ('activity list', '/api/activities/'),
+        ('activity list cursor', '/api/activities/?cursor='),
+        ('activity detail', f"/api/activities/{context['activity_id']}/"),
+        ('history', '/api/activities/history/'),
+        ('metrics', '/api/activities/metrics/'),
+        ('metrics filtered', f'/api/activities/metrics/?activity_type=running&start_date={start}'),
+        ('trends', '/api/activities/trends/'),
+        ('leaderboard', '/api/activities/leaderboard/'),
+        ('goal list', '/api/activities/goals/'),
+        ('goal detail', f"/api/activities/goals/{context['goal_id']}/"),
+        ('sync', '/api/activities/sync/?limit=50'),
+        ('profile', '/api/auth/profile/'),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare queries and latency per JWT-authenticated request with the User row '
+        'loaded on every request (JWT_STATELESS_AUTH=False) and with stateless token '
+        'users (JWT_STATELESS_AUTH=True) on a seeded throwaway database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Users to seed')
+        parser.add_argument('--activities-per-user', type=int, default=200, help='Average activities per user')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per endpoint and mode')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per endpoint and mode')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be positive.')
+
+        # Cached responses would hide the view's own queries
+        with throwaway_database(), override_settings(RESPONSE_CACHE_ENABLED=False):
+            context = self.seed(options)
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {context['token']}")
+
+            self.stdout.write(
+                f'{"endpoint":<24}{"queries":>9}{"stateless":>11}{"saved":>7}'
+                f'{"p50 ms":>9}{"stateless":>11}{"change":>9}'
+            )
+            saved = []
+            for name, url in requests(context):
+                rows = {}
+                for mode, stateless in MODES:
+                    with override_settings(JWT_STATELESS_AUTH=stateless):
+                        token_user_cache.clear()
+                        rows[mode] = self.measure(client, url, options)
+                model, claims = rows['model'], rows['stateless']
+                saved.append(model['queries'] - claims['queries'])
+                change = (claims['p50_ms'] - model['p50_ms']) / model['p50_ms'] * 100
+                self.stdout.write(
+                    f'{name:<24}{model["queries"]:>9}{claims["queries"]:>11}{saved[-1]:>7}'
+                    f'{model["p50_ms"]:>9.2f}{claims["p50_ms"]:>11.2f}{change:>+8.1f}%'
+                )
+            self.stdout.write(
+                f'Stateless JWT saves {sum(saved) / len(saved):.2f} queries per request on average.'
+            )
+
+    def seed(self, options):
+        seed_options = {
+            'seed': options['seed'],
+            'batch_size': 5000,
+            'prefix': 'bench_user_',
+            'activities_per_user': options['activities_per_user'],
+            'days': 365,
+            'goals_per_user': len(Goal.PERIOD_CHOICES),
+            'skip_derived': False,
+        }
+        self.stdout.write(
+            f"Seeding {options['users']} users with ~{options['activities_per_user']} activities each..."
+        )
+        seed_chunk(0, options['users'], seed_options, make_password('bench-pass-123'))
+        user = User.objects.get(username='bench_user_0')
+        return {
+            'token': str(RefreshToken.for_user(user).access_token),
+            'activity_id': Activity.objects.filter(user=user).values_list('pk', flat=True).first(),
+            'goal_id': Goal.objects.filter(user=user).values_list('pk', flat=True).first(),
+        }
+
+    def measure(self, client, url, options):
+        """Queries of one request and p50 latency over --iterations requests."""
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        latencies = []
+        for timed in [False] * options['warmup'] + [True] * options['iterations']:
+            queries = 0
+            with connection.execute_wrapper(count):
+                began = time.perf_counter()
+                response = client.get(url)
+                elapsed = time.perf_counter() - began
+            if response.status_code != 200:
+                raise CommandError(f'GET {url} returned {response.status_code}')
+            if timed:
+                latencies.append(elapsed)
+        # Steady state: the warmup filled the JWT user cache
+        return {'queries': queries, 'p50_ms': percentile(sorted(latencies), 50) * 1000}
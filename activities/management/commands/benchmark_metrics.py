@@ -0,0 +1,106 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Avg, Count, Sum
+from django.test.utils import CaptureQueriesContext
+
+from activities import metrics, rollups
+from activities.management.utils import throwaway_database
+from activities.models import Activity
+
+User = get_user_model()
+
+
+def legacy_metrics(activities):
+    """The three-query activity_metrics implementation, kept for comparison."""
+    result = activities.aggregate(
+        total_duration=Sum('duration'),
+        total_distance=Sum('distance'),
+        total_calories=Sum('calories_burned'),
+        average_duration=Avg('duration'),
+        total_activities=Count('id')
+    )
+    result['most_common'] = activities.values('activity_type').annotate(
+        count=Count('activity_type')
+    ).order_by('-count').first()
+    result['activities_by_type'] = dict(
+        activities.values('activity_type').annotate(
+            count=Count('activity_type')
+        ).values_list('activity_type', 'count')
+    )
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark activity_metrics: the legacy three-query path against the '
+        'single grouped query over activities and over daily rollups'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Activities to seed')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per path')
+        parser.add_argument('--batch-size', type=int, default=5000, help='bulk_create batch size')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            user = self.seed(options['rows'], options['batch_size'], options['seed'])
+            self.run(user, options['repeat'])
+
+    def seed(self, rows, batch_size, seed):
+        rng = random.Random(seed)
+        user = User.objects.create_user(
+            username='bench_metrics', email='bench_metrics@example.com', password='bench-pass'
+        )
+        types = [choice for choice, _ in Activity.ACTIVITY_TYPES]
+        start = date.today() - timedelta(days=365 * 5)
+
+        self.stdout.write(f'Seeding {rows} activities...')
+        began = time.perf_counter()
+        batch = []
+        for _ in range(rows):
+            batch.append(Activity(
+                user=user,
+                activity_type=rng.choice(types),
+                duration=rng.randint(10, 120),
+                distance=Decimal(rng.randint(100, 2000)) / 100,
+                calories_burned=rng.randint(50, 900),
+                date=start + timedelta(days=rng.randint(0, 365 * 5)),
+            ))
+            if len(batch) >= batch_size:
+                Activity.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Activity.objects.bulk_create(batch)
+        # bulk_create skips the signal handlers, so build the rollups directly
+        rollups.rebuild(user_ids=[user.pk])
+        self.stdout.write(f'Seeded in {time.perf_counter() - began:.1f}s')
+        return user
+
+    def time_path(self, func, repeat):
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        for _ in range(repeat):
+            began = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - began) * 1000)
+        return len(queries), min(timings), statistics.median(timings)
+
+    def run(self, user, repeat):
+        paths = [
+            ('legacy (3 queries, activities)', lambda: legacy_metrics(Activity.objects.filter(user=user))),
+            ('grouped (activities)', lambda: metrics.compute(user, source='activities')),
+            ('grouped (rollups)', lambda: metrics.compute(user, source='rollups')),
+        ]
+        self.stdout.write(f'{"path":<34}{"queries":>8}{"min ms":>12}{"median ms":>12}')
+        for name, func in paths:
+            queries, fastest, median = self.time_path(func, repeat)
+            self.stdout.write(f'{name:<34}{queries:>8}{fastest:>12.1f}{median:>12.1f}')
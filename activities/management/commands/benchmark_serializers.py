@@ -0,0 +1,89 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from activities.management.utils import throwaway_database
+from activities.models import Activity
+from activities.serializers import ActivityRowSerializer, ActivitySerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark activity list serialization: ActivitySerializer over model '
+        'instances against ActivityRowSerializer over values() rows'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000, help='Activities to seed')
+        parser.add_argument('--page-size', type=int, default=1000, help='Rows per page')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per path')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            user = self.seed(options['rows'], options['seed'])
+            self.run(user, options['page_size'], options['repeat'])
+
+    def seed(self, rows, seed):
+        rng = random.Random(seed)
+        user = User.objects.create_user(
+            username='bench_serializers', email='bench_serializers@example.com', password='bench-pass'
+        )
+        types = [choice for choice, _ in Activity.ACTIVITY_TYPES]
+        start = date.today() - timedelta(days=365 * 3)
+        Activity.objects.bulk_create(
+            (
+                Activity(
+                    user=user,
+                    activity_type=rng.choice(types),
+                    duration=rng.randint(10, 120),
+                    distance=Decimal(rng.randint(100, 2000)) / 100 if rng.random() < 0.8 else None,
+                    calories_burned=rng.randint(50, 900),
+                    date=start + timedelta(days=rng.randint(0, 365 * 3)),
+                    notes='x' * rng.randint(0, 200),
+                )
+                for _ in range(rows)
+            ),
+            batch_size=5000,
+        )
+        return user
+
+    def run(self, user, page_size, repeat):
+        renderer = JSONRenderer()
+        queryset = Activity.objects.filter(user=user).order_by('-date', '-created_at')
+
+        def model_serializer():
+            page = list(queryset[:page_size])
+            return renderer.render(ActivitySerializer(page, many=True).data)
+
+        def row_serializer():
+            serializer = ActivityRowSerializer(username=user.username)
+            page = list(serializer.project(queryset)[:page_size])
+            return renderer.render(serializer.serialize(page))
+
+        if model_serializer() != row_serializer():
+            raise CommandError('ActivityRowSerializer output differs from ActivitySerializer.')
+        self.stdout.write(f'Outputs are byte-identical for a {page_size}-row page.')
+
+        self.stdout.write(f'{"path":<34}{"median ms":>12}{"rows/s":>12}')
+        results = {}
+        for name, func in (('ActivitySerializer (instances)', model_serializer),
+                           ('ActivityRowSerializer (values)', row_serializer)):
+            timings = []
+            for _ in range(repeat):
+                began = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - began)
+            median = statistics.median(timings)
+            results[name] = median
+            self.stdout.write(f'{name:<34}{median * 1000:>12.1f}{page_size / median:>12.0f}')
+        baseline, fast = results.values()
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {baseline / fast:.1f}x'))
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from activities import progress, versions
+from activities.models import Goal
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the stored goal progress (current_value, percentage, completed_at) '
+        'with the daily rollups and optionally repair it'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Only check goals of this username (repeatable)',
+        )
+        parser.add_argument('--repair', action='store_true', help='Save the correct values')
+        parser.add_argument('--batch-size', type=int, default=500, help='Goals checked per query')
+
+    def handle(self, *args, **options):
+        goals = Goal.objects.select_related('user').order_by('pk')
+        if options['usernames']:
+            goals = goals.filter(user__username__in=options['usernames'])
+
+        checked = 0
+        stale = []
+        batch = []
+        for goal in goals.iterator(chunk_size=options['batch_size']):
+            batch.append(goal)
+            if len(batch) >= options['batch_size']:
+                stale += self.check_batch(batch)
+                checked += len(batch)
+                batch = []
+        if batch:
+            stale += self.check_batch(batch)
+            checked += len(batch)
+
+        if not stale:
+            self.stdout.write(self.style.SUCCESS(f'All {checked} goal(s) have consistent progress.'))
+            return
+
+        if options['repair']:
+            Goal.objects.bulk_update(
+                stale, progress.PROGRESS_FIELDS, batch_size=options['batch_size']
+            )
+            versions.bump({goal.user_id for goal in stale})
+            self.stdout.write(self.style.SUCCESS(f'Repaired {len(stale)} of {checked} goal(s).'))
+        else:
+            raise CommandError(
+                f'{len(stale)} of {checked} goal(s) have stale progress; rerun with --repair to fix them.'
+            )
+
+    def check_batch(self, goals):
+        before = {
+            goal.pk: (goal.current_value, goal.percentage, goal.completed_at) for goal in goals
+        }
+        stale = progress.stale(goals)
+        for goal in stale:
+            current_value, percentage, completed_at = before[goal.pk]
+            self.stdout.write(
+                f'{goal.user.username} goal {goal.pk} ({goal.goal_type}): stored {current_value} '
+                f'/ {percentage}% / completed {completed_at or "-"}, expected {goal.current_value} '
+                f'/ {goal.percentage}% / completed {goal.completed_at or "-"}'
+            )
+        return stale
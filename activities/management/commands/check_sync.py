@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from activities.management.utils import throwaway_database
+from activities.models import Activity
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Verify on a throwaway database, with a simulated clock, that a client '
+        'syncing regularly keeps a valid sync token past SYNC_TOMBSTONE_RETENTION_DAYS '
+        'and sees every change, while an idle client gets 410'
+    )
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            failures = self.check_sync()
+        if failures:
+            raise CommandError(f'{failures} sync check(s) failed.')
+        self.stdout.write(self.style.SUCCESS('Delta sync tokens stay valid for syncing clients.'))
+
+    def check_sync(self):
+        retention = getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30)
+        start = timezone.now()
+        user = User.objects.create_user(
+            username='sync_check', email='sync_check@example.com', password='sync-check-pass'
+        )
+        api = APIClient()
+        api.force_authenticate(user)
+
+        def at(day):
+            # Rows and tokens are stamped from timezone.now(), so patching it moves both
+            return mock.patch('django.utils.timezone.now', return_value=start + timedelta(days=day))
+
+        def sync(token=None):
+            response = api.get('/api/activities/sync/', {'sync_token': token} if token else {})
+            return response.status_code, response.data
+
+        with at(0):
+            kept = Activity.objects.create(user=user, activity_type='running', duration=30, date=date.today())
+            doomed = Activity.objects.create(user=user, activity_type='yoga', duration=20, date=date.today())
+            _, body = sync()
+            token = body['sync_token']
+            idle_token = token
+
+        failures = 0
+        # One change between syncs; the last sync lies past the retention window
+        step = max(1, retention // 3)
+        for day in range(step, retention * 2, step):
+            with at(day - 1):
+                if doomed is not None:
+                    expected = ('deleted', doomed.pk)
+                    doomed.delete()
+                    doomed = None
+                else:
+                    kept.duration += 1
+                    kept.save()
+                    expected = ('changed', kept.pk)
+            with at(day):
+                status, body = sync(token)
+            if status != 200:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'day {day}: sync returned {status}'))
+                break
+            seen = (
+                body['deleted']['activities'] if expected[0] == 'deleted'
+                else [row['id'] for row in body['activities']]
+            )
+            if expected[1] in seen:
+                self.stdout.write(f'day {day}: ok')
+            else:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'day {day}: activity {expected[1]} not {expected[0]}'))
+            token = body['sync_token']
+
+        with at(retention + 1):
+            status, _ = sync(idle_token)
+        if status == 410:
+            self.stdout.write(f'idle for {retention + 1} days: 410')
+        else:
+            failures += 1
+            self.stdout.write(self.style.ERROR(f'idle for {retention + 1} days: sync returned {status}'))
+        return failures
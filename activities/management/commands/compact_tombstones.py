@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from activities import sync
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the delete markers (tombstones) kept for delta sync once they are '
+        'older than SYNC_TOMBSTONE_RETENTION_DAYS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of tombstones deleted per DELETE',
+        )
+
+    def handle(self, *args, **options):
+        deleted = sync.compact(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} tombstone(s) older than '
+            f'{getattr(settings, "SYNC_TOMBSTONE_RETENTION_DAYS", 30)} day(s)'
+        ))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from activities import leaderboard, progress, rollups, versions
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the daily activity rollups, the leaderboard and the stored goal '
+        'progress from the activities table'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Only rebuild rollups for this username (repeatable)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rollup rows written per INSERT',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['usernames']:
+            user_ids = list(
+                User.objects.filter(username__in=options['usernames']).values_list('id', flat=True)
+            )
+            if not user_ids:
+                self.stdout.write(self.style.WARNING('No matching users, nothing to rebuild'))
+                return
+
+        written = rollups.rebuild(user_ids=user_ids, batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {written} daily rollup row(s)')
+        )
+        
+        # The leaderboard is derived from the rollups, so it goes second
+        written = leaderboard.rebuild(user_ids=user_ids, batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {written} leaderboard entries')
+        )
+        
+        repaired = progress.rebuild(user_ids=user_ids, batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Repaired the progress of {repaired} goal(s)')
+        )
+        
+        # Responses computed from the old rollups must not be served as current
+        versions.bump(user_ids if user_ids is not None else User.objects.values_list('id', flat=True))
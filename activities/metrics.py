@@ -0,0 +1,108 @@
+"""
+Activity metrics engine.
+
+Metrics are computed from a single GROUP BY activity_type query: the per-type
+rows carry the count and the duration, distance and calories sums, and the
+totals, average and most common type are derived from them in Python. The
+same engine runs over raw activities or over the daily rollups.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from .models import Activity, DailyActivityRollup
+
+
+def _filter(queryset, user, start_date=None, end_date=None, activity_type=None):
+    queryset = queryset.filter(user_id=user.pk)
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    if activity_type:
+        queryset = queryset.filter(activity_type=activity_type)
+    return queryset
+
+
+def grouped_activities(queryset):
+    """Per-type totals straight from the activities table."""
+    return queryset.values('activity_type').annotate(
+        count=Count('id'),
+        duration=Sum('duration'),
+        distance=Sum('distance'),
+        calories=Sum('calories_burned'),
+    ).order_by('activity_type')
+
+
+def grouped_rollups(queryset):
+    """Per-type totals from the daily rollups."""
+    return queryset.values('activity_type').annotate(
+        count=Sum('activity_count'),
+        duration=Sum('total_duration'),
+        distance=Sum('total_distance'),
+        calories=Sum('total_calories'),
+    ).order_by('activity_type')
+
+
+def summarize(rows):
+    """
+    Build the activity_metrics payload from per-type rows with ``count``,
+    ``duration``, ``distance`` and ``calories`` keys.
+    """
+    total_activities = 0
+    total_duration = 0
+    total_distance = Decimal('0')
+    total_calories = 0
+    most_common = None
+    activities_by_type = {}
+    totals_by_type = {}
+    for row in rows:
+        count = row['count']
+        duration = row['duration'] or 0
+        distance = row['distance'] or Decimal('0')
+        calories = row['calories'] or 0
+
+        total_activities += count
+        total_duration += duration
+        total_distance += distance
+        total_calories += calories
+        activities_by_type[row['activity_type']] = count
+        totals_by_type[row['activity_type']] = {
+            'count': count,
+            'total_duration': duration,
+            'total_distance': distance,
+            'total_calories': calories,
+        }
+        if most_common is None or count > activities_by_type[most_common]:
+            most_common = row['activity_type']
+
+    return {
+        'total_activities': total_activities,
+        'total_duration': total_duration,
+        'total_distance': total_distance,
+        'total_calories': total_calories,
+        'average_duration': (
+            total_duration / total_activities if total_activities else Decimal('0.00')
+        ),
+        'most_common_activity': most_common or 'None',
+        'activities_by_type': activities_by_type,
+        'totals_by_type': totals_by_type,
+    }
+
+
+def compute(user, start_date=None, end_date=None, activity_type=None, source=None):
+    """
+    Compute metrics for ``user`` in one query. ``source`` is 'rollups' or
+    'activities' and defaults to settings.ACTIVITY_METRICS_SOURCE.
+    """
+    source = source or getattr(settings, 'ACTIVITY_METRICS_SOURCE', 'rollups')
+    if source == 'activities':
+        rows = grouped_activities(
+            _filter(Activity.objects.all(), user, start_date, end_date, activity_type)
+        )
+    else:
+        rows = grouped_rollups(
+            _filter(DailyActivityRollup.objects.all(), user, start_date, end_date, activity_type)
+        )
+    return summarize(rows)
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:08
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_rollups(apps, schema_editor):
+    Activity = apps.get_model('activities', 'Activity')
+    DailyActivityRollup = apps.get_model('activities', 'DailyActivityRollup')
+    grouped = Activity.objects.values('user_id', 'date', 'activity_type').annotate(
+        activity_count=models.Count('id'),
+        total_duration=models.Sum('duration'),
+        total_distance=models.Sum('distance'),
+        total_calories=models.Sum('calories_burned'),
+    ).order_by()
+    DailyActivityRollup.objects.bulk_create(
+        (
+            DailyActivityRollup(
+                user_id=row['user_id'],
+                date=row['date'],
+                activity_type=row['activity_type'],
+                activity_count=row['activity_count'],
+                total_duration=row['total_duration'] or 0,
+                total_distance=row['total_distance'] or Decimal('0'),
+                total_calories=row['total_calories'] or 0,
+            )
+            for row in grouped.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('activities', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('activity_type', models.CharField(choices=[('running', 'Running'), ('cycling', 'Cycling'), ('swimming', 'Swimming'), ('walking', 'Walking'), ('weightlifting', 'Weight Lifting'), ('yoga', 'Yoga'), ('basketball', 'Basketball'), ('football', 'Football'), ('tennis', 'Tennis'), ('hiking', 'Hiking'), ('dancing', 'Dancing'), ('boxing', 'Boxing'), ('other', 'Other')], max_length=20)),
+                ('activity_count', models.IntegerField(default=0)),
+                ('total_duration', models.BigIntegerField(default=0)),
+                ('total_distance', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('total_calories', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'activity_daily_rollups',
+                'ordering': ['-date', 'activity_type'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyactivityrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'date', 'activity_type'), name='unique_daily_rollup'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:09
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+from datetime import date, timedelta
+
+
+def populate_leaderboard(apps, schema_editor):
+    DailyActivityRollup = apps.get_model('activities', 'DailyActivityRollup')
+    LeaderboardEntry = apps.get_model('activities', 'LeaderboardEntry')
+    totals = defaultdict(lambda: [0, Decimal('0'), 0])
+    for rollup in DailyActivityRollup.objects.order_by().iterator():
+        starts = {
+            'all': date(1970, 1, 1),
+            'week': rollup.date - timedelta(days=rollup.date.weekday()),
+            'month': rollup.date.replace(day=1),
+        }
+        for window, start in starts.items():
+            for board in ('', rollup.activity_type):
+                entry = totals[(rollup.user_id, window, start, board)]
+                entry[0] += rollup.activity_count
+                entry[1] += rollup.total_distance
+                entry[2] += rollup.total_calories
+    LeaderboardEntry.objects.bulk_create(
+        (
+            LeaderboardEntry(
+                user_id=user_id,
+                window=window,
+                period_start=start,
+                activity_type=board,
+                activity_count=count,
+                total_distance=distance,
+                total_calories=calories,
+            )
+            for (user_id, window, start, board), (count, distance, calories) in totals.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('activities', '0002_daily_activity_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('all', 'All time'), ('week', 'Weekly'), ('month', 'Monthly')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('activity_type', models.CharField(blank=True, choices=[('running', 'Running'), ('cycling', 'Cycling'), ('swimming', 'Swimming'), ('walking', 'Walking'), ('weightlifting', 'Weight Lifting'), ('yoga', 'Yoga'), ('basketball', 'Basketball'), ('football', 'Football'), ('tennis', 'Tennis'), ('hiking', 'Hiking'), ('dancing', 'Dancing'), ('boxing', 'Boxing'), ('other', 'Other')], max_length=20)),
+                ('activity_count', models.IntegerField(default=0)),
+                ('total_distance', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('total_calories', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'leaderboard_entries',
+                'indexes': [models.Index(fields=['window', 'period_start', 'activity_type', '-total_distance'], name='leaderboard_distance_idx'), models.Index(fields=['window', 'period_start', 'activity_type', '-total_calories'], name='leaderboard_calories_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('window', 'period_start', 'activity_type', 'user'), name='unique_leaderboard_entry'),
+        ),
+        migrations.RunPython(populate_leaderboard, migrations.RunPython.noop),
+    ]
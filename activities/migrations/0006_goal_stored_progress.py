@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:56
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.utils import timezone
+
+GOAL_METRICS = {
+    'distance': 'total_distance',
+    'duration': 'total_duration',
+    'calories': 'total_calories',
+    'frequency': 'activity_count',
+}
+
+
+def populate_progress(apps, schema_editor):
+    Goal = apps.get_model('activities', 'Goal')
+    DailyActivityRollup = apps.get_model('activities', 'DailyActivityRollup')
+    now = timezone.now()
+    goals = []
+    for goal in Goal.objects.iterator():
+        rollups = DailyActivityRollup.objects.filter(
+            user_id=goal.user_id, date__gte=goal.start_date, date__lte=goal.end_date,
+        )
+        if goal.activity_type:
+            rollups = rollups.filter(activity_type=goal.activity_type)
+        column = GOAL_METRICS.get(goal.goal_type)
+        value = (rollups.aggregate(total=models.Sum(column))['total'] if column else None) or 0
+        goal.current_value = Decimal(value).quantize(Decimal('0.01'))
+        if goal.target_value > 0:
+            goal.percentage = min(Decimal('100'), goal.current_value * 100 / goal.target_value).quantize(Decimal('0.01'))
+            goal.completed_at = now if goal.current_value >= goal.target_value else None
+        goals.append(goal)
+    Goal.objects.bulk_update(goals, ['current_value', 'percentage', 'completed_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0005_user_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='goal',
+            name='current_value',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='goal',
+            name='percentage',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+        migrations.RunPython(populate_progress, migrations.RunPython.noop),
+    ]
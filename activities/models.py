@@ -1,10 +1,16 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from collections import namedtuple
+from datetime import date
 from decimal import Decimal
 
 User = get_user_model()
 
+SNAPSHOT_FIELDS = ('user_id', 'date', 'activity_type', 'duration', 'distance', 'calories_burned')
+ActivitySnapshot = namedtuple('ActivitySnapshot', SNAPSHOT_FIELDS)
+
 class Activity(models.Model):
     ACTIVITY_TYPES = [
         ('running', 'Running'),
@@ -49,9 +55,48 @@ class Activity(models.Model):
     class Meta:
         ordering = ['-date', '-created_at']
         db_table = 'activities'
+        indexes = [
+            # History/list/cursor pages: per-user date ranges in Meta.ordering order
+            models.Index(fields=['user', 'date', 'created_at'], name='activity_user_date_idx'),
+            # activity_type filters combined with a date range
+            models.Index(fields=['user', 'activity_type', 'date'], name='activity_user_type_date_idx'),
+            # Delta sync: rows changed since a sync token's cursor
+            models.Index(fields=['user', 'updated_at', 'id'], name='activity_user_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.get_activity_type_display()} on {self.date}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted metrics so the rollup signal handlers can
+        # apply a delta on save/delete without re-reading the row.
+        if all(name in field_names for name in SNAPSHOT_FIELDS):
+            instance._loaded_snapshot = instance.snapshot()
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # The post_save handlers update the derived stores (activities.signals);
+        # commit them together with the row or not at all. delete() already
+        # runs its post_delete handlers inside the deletion's transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def snapshot(self):
+        """
+        Return the metric-bearing fields of this activity as a tuple, holding
+        the values the database stores (e.g. a distance of 5.5 or '5.5' as
+        Decimal('5.50')) whatever was assigned to the attributes.
+        """
+        values = []
+        for name in SNAPSHOT_FIELDS:
+            field = self._meta.get_field(name)
+            value = field.to_python(getattr(self, field.attname))
+            if value is not None and isinstance(field, models.DecimalField):
+                value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+            values.append(value)
+        return ActivitySnapshot(*values)
 
 class Goal(models.Model):
     GOAL_TYPES = [
@@ -81,12 +126,139 @@ class Goal(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     is_active = models.BooleanField(default=True)
+    # Progress kept up to date by activities.progress on every activity write
+    current_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
         db_table = 'goals'
+        indexes = [
+            models.Index(fields=['user', 'is_active'], name='goal_user_active_idx'),
+            # Delta sync: rows changed since a sync token's cursor
+            models.Index(fields=['user', 'updated_at', 'id'], name='goal_user_updated_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.goal_type} goal: {self.target_value}"
+
+class DailyActivityRollup(models.Model):
+    """
+    Per-user, per-day, per-activity_type totals.
+    Kept up to date by the Activity signal handlers in activities.signals and
+    rebuilt from scratch with ``manage.py rebuild_rollups``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_rollups')
+    date = models.DateField()
+    activity_type = models.CharField(max_length=20, choices=Activity.ACTIVITY_TYPES)
+    activity_count = models.IntegerField(default=0)
+    total_duration = models.BigIntegerField(default=0)
+    total_distance = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    total_calories = models.BigIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-date', 'activity_type']
+        db_table = 'activity_daily_rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'date', 'activity_type'],
+                name='unique_daily_rollup',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.activity_type} on {self.date}: {self.activity_count}"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Materialized per-user distance/calories totals for one leaderboard window.
+    ``activity_type`` is blank for the all-activities board. All-time entries
+    use ALL_TIME_START as their period_start.
+    """
+    WINDOW_CHOICES = [
+        ('all', 'All time'),
+        ('week', 'Weekly'),
+        ('month', 'Monthly'),
+    ]
+    ALL_TIME_START = date(1970, 1, 1)
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    window = models.CharField(max_length=5, choices=WINDOW_CHOICES)
+    period_start = models.DateField()
+    activity_type = models.CharField(max_length=20, choices=Activity.ACTIVITY_TYPES, blank=True)
+    activity_count = models.IntegerField(default=0)
+    total_distance = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    total_calories = models.BigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'leaderboard_entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['window', 'period_start', 'activity_type', 'user'],
+                name='unique_leaderboard_entry',
+            ),
+        ]
+        # Top-K reads walk one of these indexes and stop after K rows
+        indexes = [
+            models.Index(
+                fields=['window', 'period_start', 'activity_type', '-total_distance'],
+                name='leaderboard_distance_idx',
+            ),
+            models.Index(
+                fields=['window', 'period_start', 'activity_type', '-total_calories'],
+                name='leaderboard_calories_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.window} {self.period_start} {self.activity_type or 'all'}"
+
+class UserDataVersion(models.Model):
+    """
+    Per-user counter bumped on every Activity or Goal write.
+    Backs the ETag/Last-Modified validators of the per-user read endpoints.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='data_version'
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'user_data_versions'
+    
+    def __str__(self):
+        return f"{self.user_id} - v{self.version}"
+
+
+class Tombstone(models.Model):
+    """
+    Marker left by a deleted Activity or Goal so delta sync clients learn
+    about the deletion (see activities.sync). Written by the post_delete
+    handlers in activities.signals and removed after
+    SYNC_TOMBSTONE_RETENTION_DAYS by ``manage.py compact_tombstones``.
+    """
+    KIND_CHOICES = [
+        ('activity', 'Activity'),
+        ('goal', 'Goal'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'tombstones'
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id'], name='tombstone_user_deleted_idx'),
+            # Compaction deletes by age across all users
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.user.username} - {self.goal_type} goal: {self.target_value}"
\ No newline at end of file
+        return f"{self.user_id} - {self.kind} {self.object_id} deleted {self.deleted_at}"
@@ -0,0 +1,111 @@
+import base64
+import json
+
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination for activities on (date, created_at, id).
+
+    Each page ends with an opaque cursor encoding the last row's key; the next
+    page is fetched with a WHERE on that key instead of an OFFSET, and no
+    COUNT(*) is run. Only ``ordering=-date`` (the default) and ``ordering=date``
+    are supported in this mode.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE or 20
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_descending(self, request):
+        ordering = request.query_params.get('ordering', '-date')
+        if ordering not in ('-date', 'date'):
+            raise ValidationError(
+                {'ordering': 'Cursor pagination only supports ordering by date or -date.'}
+            )
+        return ordering.startswith('-')
+
+    def encode_cursor(self, activity):
+        # Pages are model instances or values() dicts (ActivityRowSerializer)
+        if isinstance(activity, dict):
+            key = [activity['date'].isoformat(), activity['created_at'].isoformat(), activity['id']]
+        else:
+            key = [activity.date.isoformat(), activity.created_at.isoformat(), activity.pk]
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            day, created_at, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            key = (parse_date(day), parse_datetime(created_at), int(pk))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in key:
+            raise NotFound(self.invalid_cursor_message)
+        return key
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        descending = self.get_descending(request)
+        cursor = self.decode_cursor(request)
+
+        if descending:
+            queryset = queryset.order_by('-date', '-created_at', '-id')
+        else:
+            queryset = queryset.order_by('date', 'created_at', 'id')
+
+        if cursor is not None:
+            day, created_at, pk = cursor
+            op = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'date__{op}': day})
+                | Q(date=day, **{f'created_at__{op}': created_at})
+                | Q(date=day, created_at=created_at, **{f'id__{op}': pk})
+            )
+
+        # Fetch one extra row to learn whether there is a next page
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_cursor = self.encode_cursor(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,208 @@
+"""
+Stored goal progress.
+
+Every Goal keeps its current_value, percentage and completed_at columns up to
+date, so reads never aggregate activities. Activity writes apply the same
+per-(user, date, activity_type) deltas as the daily rollups (see
+activities.signals): the goals whose window and activity type cover a delta
+are read with a row lock, their new value, percentage and completion time are
+derived in Python with the same stored_progress() used everywhere else, and
+they are saved with one bulk UPDATE. A goal that is created or edited is
+recomputed from the daily rollups before it is saved.
+
+current_values() computes progress for many goals in one query: goals that
+share a (user, goal_type, activity_type, date window) bucket share one
+conditional SUM. rebuild() and the check_goal_progress command use it to
+verify and repair the stored values.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import DailyActivityRollup, Goal
+
+# Rollup column that measures each goal type
+GOAL_METRICS = {
+    'distance': 'total_distance',
+    'duration': 'total_duration',
+    'calories': 'total_calories',
+    'frequency': 'activity_count',
+}
+
+# Position of each goal type's measure in a rollups.collect_deltas() delta
+DELTA_INDEX = {
+    'frequency': 0,
+    'duration': 1,
+    'distance': 2,
+    'calories': 3,
+}
+
+# Columns written by this module; updated_at is included because
+# QuerySet.update() and bulk_update() skip auto_now, and delta sync clients
+# must see the new progress
+PROGRESS_FIELDS = ['current_value', 'percentage', 'completed_at', 'updated_at']
+
+HUNDRED = Decimal('100')
+CENTS = Decimal('0.01')
+
+
+def _bucket(goal):
+    return (goal.user_id, goal.goal_type, goal.activity_type, goal.start_date, goal.end_date)
+
+
+def current_values(goals):
+    """
+    Return {goal.pk: current value} for ``goals`` using at most one query.
+    """
+    buckets = {}
+    for goal in goals:
+        if goal.goal_type in GOAL_METRICS:
+            buckets.setdefault(_bucket(goal), f'b{len(buckets)}')
+    if not buckets:
+        return {goal.pk: 0 for goal in goals}
+
+    aggregates = {}
+    for (user_id, goal_type, activity_type, start_date, end_date), alias in buckets.items():
+        condition = Q(user_id=user_id, date__gte=start_date, date__lte=end_date)
+        if activity_type:
+            condition &= Q(activity_type=activity_type)
+        aggregates[alias] = Sum(GOAL_METRICS[goal_type], filter=condition)
+
+    keys = list(buckets)
+    totals = DailyActivityRollup.objects.filter(
+        user_id__in={key[0] for key in keys},
+        date__gte=min(key[3] for key in keys),
+        date__lte=max(key[4] for key in keys),
+    ).aggregate(**aggregates)
+
+    values = {}
+    for goal in goals:
+        alias = buckets.get(_bucket(goal))
+        total = totals[alias] if alias else None
+        if goal.goal_type == 'distance':
+            values[goal.pk] = total or Decimal('0')
+        else:
+            values[goal.pk] = total or 0
+    return values
+
+
+def stored_progress(goal, value):
+    """
+    Return the (current_value, percentage, completed_at) to store for
+    ``goal`` when its current value is ``value``. completed_at keeps the
+    first time the target was reached and is cleared below the target.
+    """
+    value = Decimal(value).quantize(CENTS)
+    target = goal.target_value
+    if target > 0:
+        percentage = min(HUNDRED, value * HUNDRED / target).quantize(CENTS)
+    else:
+        percentage = Decimal('0.00')
+    if target <= 0 or value < target:
+        completed_at = None
+    else:
+        completed_at = goal.completed_at or timezone.now()
+    return value, percentage, completed_at
+
+
+def refresh(goal):
+    """Recompute the stored progress of an unsaved or edited ``goal`` in place."""
+    value = current_values([goal])[goal.pk]
+    goal.current_value, goal.percentage, goal.completed_at = stored_progress(goal, value)
+
+
+def apply_deltas(deltas):
+    """
+    Add the output of rollups.collect_deltas() to the stored progress of
+    every goal it touches: one SELECT ... FOR UPDATE, then one bulk UPDATE.
+    Must run inside a transaction.
+    """
+    if not deltas:
+        return
+    by_user = defaultdict(list)
+    for (user_id, day, activity_type), delta in deltas.items():
+        by_user[user_id].append((day, activity_type, delta))
+    days = [day for _, day, _ in deltas]
+
+    goals = Goal.objects.select_for_update().filter(
+        user_id__in=list(by_user), start_date__lte=max(days), end_date__gte=min(days),
+    ).only(
+        'pk', 'user_id', 'goal_type', 'activity_type', 'start_date', 'end_date',
+        'target_value', 'current_value', 'completed_at',
+    )
+
+    now = timezone.now()
+    changed = []
+    for goal in goals:
+        index = DELTA_INDEX.get(goal.goal_type)
+        if index is None:
+            continue
+        amount = sum(
+            delta[index]
+            for day, activity_type, delta in by_user[goal.user_id]
+            if goal.start_date <= day <= goal.end_date
+            and (not goal.activity_type or activity_type == goal.activity_type)
+        )
+        if amount:
+            goal.current_value, goal.percentage, goal.completed_at = stored_progress(
+                goal, goal.current_value + amount
+            )
+            goal.updated_at = now
+            changed.append(goal)
+    Goal.objects.bulk_update(changed, PROGRESS_FIELDS)
+
+
+def stale(goals):
+    """
+    Return the goals among ``goals`` whose stored progress differs from the
+    daily rollups, updated in place to the correct values.
+    """
+    values = current_values(goals)
+    now = timezone.now()
+    changed = []
+    for goal in goals:
+        stored = (goal.current_value, goal.percentage, goal.completed_at is not None)
+        goal.current_value, goal.percentage, goal.completed_at = stored_progress(goal, values[goal.pk])
+        if stored != (goal.current_value, goal.percentage, goal.completed_at is not None):
+            goal.updated_at = now
+            changed.append(goal)
+    return changed
+
+
+def rebuild(user_ids=None, batch_size=500):
+    """
+    Recompute stored progress from the daily rollups for every goal (or the
+    goals of ``user_ids``) and save the ones that were wrong. Returns the
+    number of goals repaired.
+    """
+    goals = Goal.objects.order_by('pk')
+    if user_ids is not None:
+        goals = goals.filter(user_id__in=user_ids)
+    repaired = 0
+    batch = []
+    for goal in goals.iterator(chunk_size=batch_size):
+        batch.append(goal)
+        if len(batch) >= batch_size:
+            repaired += _save_stale(batch)
+            batch = []
+    if batch:
+        repaired += _save_stale(batch)
+    return repaired
+
+
+def _save_stale(goals):
+    changed = stale(goals)
+    Goal.objects.bulk_update(changed, PROGRESS_FIELDS)
+    return len(changed)
+
+
+def progress_payload(goal):
+    """Build the ``progress`` dict exposed by GoalSerializer from the stored columns."""
+    current = goal.current_value
+    return {
+        'current': float(current) if goal.goal_type == 'distance' else int(current),
+        'target': float(goal.target_value),
+        'percentage': float(goal.percentage),
+    }
@@ -0,0 +1,112 @@
+"""
+Versioned per-user response cache.
+
+Successful GET bodies of per-user read views are stored in Django's cache
+under a key made of the view, the user, the user's data version and the
+normalized query string (plus the view's ``vary`` value, if any). Writes
+never delete anything: they bump the data version (see activities.versions),
+so later requests simply look under a new key and the stale entries expire
+on their own.
+"""
+import hashlib
+import threading
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+from users import prometheus
+
+from . import versions
+
+_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+
+
+def stats():
+    """Return ``{view: {'hits': n, 'misses': n}}`` for this process."""
+    with _lock:
+        return {
+            name: {'hits': _hits[name], 'misses': _misses[name]}
+            for name in sorted(set(_hits) | set(_misses))
+        }
+
+
+def reset_stats():
+    with _lock:
+        _hits.clear()
+        _misses.clear()
+
+
+def _count(counter, name):
+    with _lock:
+        counter[name] += 1
+    prometheus.CACHE_REQUESTS.inc(name, 'hit' if counter is _hits else 'miss')
+
+
+def cache_key(name, request, version, variant=''):
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    # Paginated bodies contain absolute next/previous links
+    digest = hashlib.md5(repr((request.get_host(), params, variant)).encode()).hexdigest()
+    return f'response:{name}:{request.user.id}:{version}:{digest}'
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _applies(request):
+    user = request.user
+    return (request.method == 'GET' and not hasattr(user, 'developer') and user.is_authenticated
+            and getattr(settings, 'RESPONSE_CACHE_ENABLED', True))
+
+
+def _lookup(name, request, vary=None):
+    """Return (key, cached data or None) for ``request``."""
+    version, _ = versions.for_request(request)
+    key = cache_key(name, request, version, vary(request) if vary else '')
+    return key, _cache().get(key)
+
+
+def _cacheable(response):
+    return response.status_code == status.HTTP_200_OK and isinstance(response, Response)
+
+
+def _timeout(timeout):
+    return timeout if timeout is not None else getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def cached_user_response(name, timeout=None, vary=None):
+    """
+    Serve successful GET responses of the decorated view from the cache,
+    keyed per user and data version. Apply it below @api_view (and below
+    @user_data_conditional), or with method_decorator on a view method.
+    ``vary(request)`` returns a string added to the key, for views whose
+    body changes without a write (e.g. with the current date).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _applies(request):
+                return view(request, *args, **kwargs)
+
+            key, data = _lookup(name, request, vary)
+            if data is not None:
+                _count(_hits, name)
+                return Response(data)
+
+            _count(_misses, name)
+            response = view(request, *args, **kwargs)
+            if _cacheable(response):
+                _cache().set(key, response.data, _timeout(timeout))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,95 @@
+"""
+Daily rollups of activity metrics.
+
+Each DailyActivityRollup row holds the count and the duration, distance and
+calories sums for one (user, date, activity_type). Rows are maintained
+incrementally from the Activity signal handlers and can be rebuilt from the
+raw activities at any time.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from . import counters
+from .models import Activity, DailyActivityRollup
+
+
+def _empty_delta():
+    return [0, 0, Decimal('0'), 0]
+
+
+def _add_snapshot(deltas, snap, sign):
+    delta = deltas[(snap.user_id, snap.date, snap.activity_type)]
+    delta[0] += sign
+    delta[1] += sign * (snap.duration or 0)
+    delta[2] += sign * (snap.distance or Decimal('0'))
+    delta[3] += sign * (snap.calories_burned or 0)
+
+
+def collect_deltas(removed=(), added=()):
+    """
+    Group activity snapshots into per-(user, date, activity_type) deltas.
+    ``removed`` snapshots are subtracted and ``added`` snapshots are added.
+    """
+    deltas = defaultdict(_empty_delta)
+    for snap in removed:
+        _add_snapshot(deltas, snap, -1)
+    for snap in added:
+        _add_snapshot(deltas, snap, 1)
+    # Drop keys that cancel out, e.g. an update that only touched notes.
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def apply_deltas(deltas):
+    """Apply the output of collect_deltas() to the rollup table."""
+    counters.apply(
+        DailyActivityRollup,
+        ('user_id', 'date', 'activity_type'),
+        ('activity_count', 'total_duration', 'total_distance', 'total_calories'),
+        deltas,
+    )
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """
+    Recompute rollups from the activities table.
+    Rebuilds every user unless ``user_ids`` is given. Returns the number of
+    rollup rows written.
+    """
+    activities = Activity.objects.all()
+    rollups = DailyActivityRollup.objects.all()
+    if user_ids is not None:
+        activities = activities.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    grouped = activities.values('user_id', 'date', 'activity_type').annotate(
+        activity_count=Count('id'),
+        total_duration=Sum('duration'),
+        total_distance=Sum('distance'),
+        total_calories=Sum('calories_burned'),
+    ).order_by()
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in grouped.iterator(chunk_size=batch_size):
+            batch.append(DailyActivityRollup(
+                user_id=row['user_id'],
+                date=row['date'],
+                activity_type=row['activity_type'],
+                activity_count=row['activity_count'],
+                total_duration=row['total_duration'] or 0,
+                total_distance=row['total_distance'] or Decimal('0'),
+                total_calories=row['total_calories'] or 0,
+            ))
+            if len(batch) >= batch_size:
+                DailyActivityRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            DailyActivityRollup.objects.bulk_create(batch)
+            written += len(batch)
+    return written
@@ -1,9 +1,59 @@
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from .models import Activity, Goal
+from .progress import progress_payload
 from django.utils import timezone
+from django.utils.functional import cached_property
 from datetime import date
 
-class ActivitySerializer(serializers.ModelSerializer):
+
+def requested_fields(request, serializer_class):
+    """
+    Parse ``?fields=a,b`` into the requested serializer field names, in the
+    serializer's order. Returns None when the parameter is absent or empty.
+    """
+    raw = request.query_params.get('fields', '')
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    if not names:
+        return None
+    available = list(serializer_class().fields)
+    unknown = sorted(names - set(available))
+    if unknown:
+        raise serializers.ValidationError(
+            {'fields': [f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(available)}."]}
+        )
+    return [name for name in available if name in names]
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin for sparse fieldsets: only the fields listed in
+    ``context['fields']`` are rendered (all of them when it is None).
+    ``sparse_columns`` maps serializer fields to the model columns they read
+    when they are not plain model fields.
+    """
+    sparse_columns = {}
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+    
+    @classmethod
+    def project(cls, queryset, fields):
+        """Restrict ``queryset`` to the columns needed to render ``fields``."""
+        if fields is None:
+            return queryset
+        columns = {'id'}
+        for name in fields:
+            columns.update(cls.sparse_columns.get(name, (name,)))
+        if not any('__' in column for column in columns):
+            # Nothing is read through a join any more
+            queryset = queryset.select_related(None)
+        return queryset.only(*columns)
+
+class ActivitySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     
     class Meta:
@@ -28,62 +78,57 @@ class ActivityCreateSerializer(serializers.ModelSerializer):
         model = Activity
         fields = ('activity_type', 'duration', 'distance', 'calories_burned', 'date', 'notes')
     
+    @cached_property
+    def _writable_fields(self):
+        # A list rather than DRF's generator over the field mapping: bulk
+        # ingestion validates every row with one instance
+        return [field for field in self.fields.values() if not field.read_only]
+    
     def validate_date(self, value):
         if value > date.today():
             raise serializers.ValidationError("Activity date cannot be in the future.")
         return value
 
-class GoalSerializer(serializers.ModelSerializer):
+class GoalSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     progress = serializers.SerializerMethodField()
     
+    sparse_columns = {
+        'user': ('user', 'user__username'),
+        'progress': ('goal_type', 'target_value', 'current_value', 'percentage'),
+    }
+    
     class Meta:
         model = Goal
         fields = '__all__'
-        read_only_fields = ('id', 'user', 'created_at', 'updated_at', 'progress')
+        read_only_fields = (
+            'id', 'user', 'created_at', 'updated_at', 'progress',
+            'current_value', 'percentage', 'completed_at',
+        )
     
     def get_progress(self, obj):
-        # Calculate progress based on user's activities
-        from django.db.models import Sum
-        from decimal import Decimal
-        
-        activities = Activity.objects.filter(
-            user=obj.user,
-            date__gte=obj.start_date,
-            date__lte=obj.end_date
-        )
-        
-        if obj.activity_type:
-            activities = activities.filter(activity_type=obj.activity_type)
-        
-        if obj.goal_type == 'distance':
-            current = activities.aggregate(
-                total=Sum('distance')
-            )['total'] or Decimal('0')
-        elif obj.goal_type == 'duration':
-            current = activities.aggregate(
-                total=Sum('duration')
-            )['total'] or 0
-        elif obj.goal_type == 'calories':
-            current = activities.aggregate(
-                total=Sum('calories_burned')
-            )['total'] or 0
-        elif obj.goal_type == 'frequency':
-            current = activities.count()
-        else:
-            current = 0
-        
-        return {
-            'current': float(current) if isinstance(current, Decimal) else current,
-            'target': float(obj.target_value),
-            'percentage': min(100, (float(current) / float(obj.target_value)) * 100) if obj.target_value > 0 else 0
-        }
+        # Stored on the goal and kept current by activities.progress
+        return progress_payload(obj)
     
     def validate(self, attrs):
         if attrs['start_date'] >= attrs['end_date']:
             raise serializers.ValidationError("End date must be after start date.")
         return attrs
 
+class ActivityTypeTotalsSerializer(serializers.Serializer):
+    count = serializers.IntegerField()
+    total_duration = serializers.IntegerField()
+    total_distance = serializers.DecimalField(max_digits=14, decimal_places=2)
+    total_calories = serializers.IntegerField()
+
+class TrendPointSerializer(serializers.Serializer):
+    period_start = serializers.DateField()
+    count = serializers.IntegerField()
+    total_duration = serializers.IntegerField()
+    total_distance = serializers.DecimalField(max_digits=14, decimal_places=2)
+    total_calories = serializers.IntegerField()
+    by_type = serializers.DictField(child=ActivityTypeTotalsSerializer(), required=False)
+
 class ActivityMetricsSerializer(serializers.Serializer):
     total_activities = serializers.IntegerField()
     total_duration = serializers.IntegerField()
@@ -91,4 +136,82 @@ class ActivityMetricsSerializer(serializers.Serializer):
     total_calories = serializers.IntegerField()
     average_duration = serializers.DecimalField(max_digits=8, decimal_places=2)
     most_common_activity = serializers.CharField()
-    activities_by_type = serializers.DictField()
\ No newline at end of file
+    activities_by_type = serializers.DictField()
+    totals_by_type = serializers.DictField(child=ActivityTypeTotalsSerializer())
+
+
+def _compile_converter(field):
+    """Return a function mapping a raw column value to ``field``'s output."""
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if isinstance(field, serializers.DecimalField) and coerce_to_string:
+        places = field.decimal_places
+        # Column values already carry the field's decimal places
+        return lambda value: f'{value:.{places}f}'
+    if isinstance(field, serializers.DateTimeField):
+        tz = field.default_timezone()
+        
+        def convert_datetime(value):
+            if tz is not None and timezone.is_aware(value):
+                value = value.astimezone(tz)
+            value = value.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert_datetime
+    if isinstance(field, serializers.DateField):
+        return date.isoformat
+    if isinstance(field, (serializers.IntegerField, serializers.CharField, serializers.ChoiceField)):
+        # The database already returns int/str values for these columns
+        return None
+    return field.to_representation
+
+class ActivityRowSerializer:
+    """
+    Read-only list serializer producing the same output as ActivitySerializer
+    from ``values()`` rows instead of model instances.
+    
+    Use ``project()`` on the queryset before paginating, then
+    ``serialize()`` on the page. The per-field converters are built once from
+    ActivitySerializer's fields, so output stays in step with it. Pass
+    ``username`` when every row belongs to one user to skip the join behind
+    the ``user`` field (User.__str__ is the username), and ``fields`` to
+    render (and read) only those fields.
+    """
+    _compiled = None
+    # Always read: keyset pagination builds its cursors from them
+    key_columns = ('id', 'date', 'created_at')
+    
+    def __init__(self, username=None, fields=None):
+        self.username = username
+        self.fields = [
+            field for field in self.compiled()
+            if fields is None or field[0] in fields
+        ]
+    
+    @classmethod
+    def compiled(cls):
+        if cls._compiled is None:
+            compiled = []
+            for name, field in ActivitySerializer().fields.items():
+                if name == 'user':
+                    compiled.append((name, 'user__username', None))
+                else:
+                    compiled.append((name, field.source, _compile_converter(field)))
+            cls._compiled = compiled
+        return cls._compiled
+    
+    def project(self, queryset):
+        columns = [source for name, source, _ in self.fields if not (name == 'user' and self.username)]
+        columns += [column for column in self.key_columns if column not in columns]
+        return queryset.values(*columns)
+    
+    def to_representation(self, row):
+        data = {}
+        for name, source, convert in self.fields:
+            if name == 'user' and self.username:
+                data[name] = self.username
+                continue
+            value = row[source]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+    
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
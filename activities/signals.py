@@ -0,0 +1,97 @@
+"""
+Signal handlers that keep derived activity data (rollups, leaderboard and
+stored goal progress) in step with Activity writes, bump the per-user
+data version on Activity and Goal writes, and leave a Tombstone for every
+deleted Activity or Goal (for delta sync, see activities.sync).
+
+Every create, update and delete of an Activity (through the API views, the
+admin or the ORM) is turned into an (old snapshot, new snapshot) pair and
+handed to the derived stores. QuerySet.update() and bulk_create() bypass
+these handlers; callers using them must update the stores themselves or run
+``manage.py rebuild_rollups``.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import leaderboard, progress, rollups, versions
+from .models import Activity, Goal, Tombstone
+
+User = get_user_model()
+
+
+def sync_derived_data(removed=(), added=()):
+    """
+    Update every derived store for the given activity snapshots.
+    ``removed`` snapshots stop counting and ``added`` snapshots start counting;
+    an update is one of each.
+    """
+    deltas = rollups.collect_deltas(removed=removed, added=added)
+    # Part of the caller's transaction when there is one (Activity.save()
+    # and delete() always open one), without the cost of a savepoint
+    with transaction.atomic(savepoint=False):
+        if deltas:
+            rollups.apply_deltas(deltas)
+            leaderboard.apply_deltas(deltas)
+            progress.apply_deltas(deltas)
+        # Also for writes that leave every total unchanged (e.g. notes edits)
+        versions.bump({snap.user_id for snap in (*removed, *added)})
+
+
+def _is_user_cascade(origin):
+    # Deleting a user cascades to its activities and to every derived row, so
+    # there is nothing to keep in step.
+    return isinstance(origin, User)
+
+
+@receiver(pre_save, sender=Activity)
+def capture_activity_snapshot(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or hasattr(instance, '_loaded_snapshot'):
+        return
+    # The instance was not loaded through from_db (e.g. built by hand with a
+    # pk), so read the persisted values before they are overwritten.
+    previous = Activity.objects.filter(pk=instance.pk).first()
+    instance._loaded_snapshot = previous.snapshot() if previous else None
+
+
+@receiver(post_save, sender=Activity)
+def activity_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else getattr(instance, '_loaded_snapshot', None)
+    new = instance.snapshot()
+    sync_derived_data(removed=[old] if old else (), added=[new])
+    instance._loaded_snapshot = new
+
+
+@receiver(post_delete, sender=Activity)
+def activity_deleted(sender, instance, origin=None, **kwargs):
+    if _is_user_cascade(origin):
+        return
+    old = getattr(instance, '_loaded_snapshot', None) or instance.snapshot()
+    Tombstone.objects.create(user_id=instance.user_id, kind='activity', object_id=instance.pk)
+    sync_derived_data(removed=[old])
+
+
+@receiver(pre_save, sender=Goal)
+def refresh_goal_progress(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The window, type or target may have changed; recount from the rollups
+    progress.refresh(instance)
+
+
+@receiver(post_save, sender=Goal)
+def goal_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    versions.bump([instance.user_id])
+
+
+@receiver(post_delete, sender=Goal)
+def goal_deleted(sender, instance, origin=None, **kwargs):
+    if _is_user_cascade(origin):
+        return
+    Tombstone.objects.create(user_id=instance.user_id, kind='goal', object_id=instance.pk)
+    versions.bump([instance.user_id])
@@ -0,0 +1,159 @@
+"""
+Delta sync for offline-first clients.
+
+A sync token is a signed cursor over three streams of the user's data:
+activities and goals in (updated_at, id) order, and tombstones of deleted
+rows in (deleted_at, id) order. A sync reads each stream from the token's
+cursor on, one range scan over a (user, timestamp, id) index, so the work
+and the payload grow with the number of changes, not with the history.
+Streams are read ``limit`` rows at a time; clients repeat the call with the
+new token while ``has_more`` is set.
+
+updated_at is assigned before a transaction commits, so a slow write can
+become visible after a sync already moved past its timestamp. Once a stream
+is exhausted its cursor is therefore set to SYNC_SETTLE_SECONDS ago, and the
+rows of that window are sent again on the next sync (clients apply rows as
+upserts, so repeats are harmless).
+
+Tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS are compacted away; a
+token whose tombstone cursor is older than that may miss deletions and is
+refused (ExpiredToken), and the client has to sync again from scratch.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Activity, Goal, Tombstone
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+_SALT = 'activities.sync'
+
+# stream -> (model, timestamp column)
+STREAMS = {
+    'activities': (Activity, 'updated_at'),
+    'goals': (Goal, 'updated_at'),
+    'tombstones': (Tombstone, 'deleted_at'),
+}
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class ExpiredToken(Exception):
+    pass
+
+
+def retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def issue(user_id, cursors):
+    """Sign ``cursors`` ({stream: (timestamp, id)}) into a sync token for ``user_id``."""
+    return signing.dumps(
+        {
+            'u': user_id,
+            'c': {stream: [moment.isoformat(), pk] for stream, (moment, pk) in cursors.items()},
+        },
+        salt=_SALT,
+        compress=True,
+    )
+
+
+def parse(token, user_id):
+    """
+    Return the cursors of a token issued to ``user_id``.
+    Raises InvalidToken or ExpiredToken.
+    """
+    try:
+        payload = signing.loads(token, salt=_SALT)
+        if payload['u'] != user_id:
+            raise InvalidToken()
+        cursors = {
+            stream: (parse_datetime(payload['c'][stream][0]), int(payload['c'][stream][1]))
+            for stream in STREAMS
+        }
+    except (signing.BadSignature, KeyError, IndexError, TypeError, ValueError):
+        raise InvalidToken()
+    if any(moment is None for moment, _ in cursors.values()):
+        raise InvalidToken()
+    if cursors['tombstones'][0] < timezone.now() - retention():
+        raise ExpiredToken()
+    return cursors
+
+
+def _read(queryset, column, cursor, limit):
+    """Up to ``limit`` rows of ``queryset`` after ``cursor`` in (column, id) order, and whether more follow."""
+    if cursor is not None:
+        moment, pk = cursor
+        # Equivalent to (column, id) > cursor, written as a range the index can seek
+        queryset = queryset.filter(**{f'{column}__gte': moment}).exclude(**{column: moment, 'id__lte': pk})
+    rows = list(queryset.order_by(column, 'id')[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def _key(row, column):
+    if isinstance(row, dict):
+        return row[column], row['id']
+    return getattr(row, column), row.pk
+
+
+def changes(user, token=None, limit=DEFAULT_LIMIT, activity_rows=None, goal_rows=None):
+    """
+    Return the rows that changed for ``user`` since ``token`` (everything if
+    None) as a dict with ``activities``, ``goals``, ``tombstones``, the new
+    ``sync_token`` and ``has_more``. ``activity_rows`` and ``goal_rows``
+    shape the querysets read for those streams (e.g. a values() projection).
+    """
+    now = timezone.now()
+    settled = (now - timedelta(seconds=getattr(settings, 'SYNC_SETTLE_SECONDS', 5)), 0)
+    if token:
+        cursors = parse(token, user.pk)
+    else:
+        # A fresh client has nothing to delete, but must hear about
+        # deletions made while it pages through the initial download
+        cursors = {'activities': None, 'goals': None, 'tombstones': settled}
+
+    shapes = {
+        'activities': activity_rows or (lambda queryset: queryset),
+        'goals': goal_rows or (lambda queryset: queryset),
+        'tombstones': lambda queryset: queryset.values('id', 'kind', 'object_id', 'deleted_at'),
+    }
+    result = {}
+    next_cursors = {}
+    has_more = False
+    for stream, (model, column) in STREAMS.items():
+        queryset = shapes[stream](model.objects.filter(user_id=user.pk))
+        rows, more = _read(queryset, column, cursors[stream], limit)
+        if more:
+            cursor = _key(rows[-1], column)
+        else:
+            # Everything was read: move to the settle point, forward as well
+            # as back, so a client that keeps syncing never expires
+            cursor = settled
+        result[stream] = rows
+        next_cursors[stream] = cursor
+        has_more = has_more or more
+
+    result['sync_token'] = issue(user.pk, next_cursors)
+    result['has_more'] = has_more
+    return result
+
+
+def compact(batch_size=1000):
+    """Delete tombstones older than the retention period; returns how many."""
+    horizon = timezone.now() - retention()
+    deleted = 0
+    while True:
+        pks = list(
+            Tombstone.objects.filter(deleted_at__lt=horizon).order_by('deleted_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted
+        deleted += Tombstone.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,449 @@
+import re
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import leaderboard, progress, response_cache, rollups, sync
+from .models import Activity, DailyActivityRollup, Goal, LeaderboardEntry
+
+User = get_user_model()
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Reads SQLite query plans')
+class QueryPlanTests(TestCase):
+    """Every activities read endpoint must run on index searches, never full scans."""
+
+    # Tables whose queries must always be index searches
+    HOT_TABLES = ('activities', 'goals', 'activity_daily_rollups', 'leaderboard_entries', 'tombstones')
+
+    # Every read endpoint in activities.urls, with the filters clients send
+    ENDPOINTS = [
+        '/api/activities/',
+        '/api/activities/?activity_type=running&start_date=2024-01-01',
+        '/api/activities/?cursor=',
+        '/api/activities/?fields=date,activity_type,duration',
+        '/api/activities/{activity_id}/',
+        '/api/activities/history/',
+        '/api/activities/history/?start_date=2024-01-01&end_date=2024-06-30',
+        '/api/activities/history/?activity_type=running&start_date=2024-01-01',
+        '/api/activities/history/?cursor=&page_size=50',
+        '/api/activities/export/',
+        '/api/activities/export/?export_format=csv&activity_type=running&start_date=2024-01-01',
+        '/api/activities/metrics/',
+        '/api/activities/metrics/?activity_type=cycling&start_date=2024-01-01',
+        '/api/activities/trends/',
+        '/api/activities/trends/?bucket=month&by_type=true&start_date=2024-01-01',
+        '/api/activities/trends/?bucket=day&activity_type=running&start_date=2024-01-01&end_date=2024-03-31',
+        '/api/activities/leaderboard/',
+        '/api/activities/leaderboard/?window=week&activity_type=running',
+        '/api/activities/sync/',
+        '/api/activities/sync/?sync_token={sync_token}&limit=50',
+        '/api/activities/goals/',
+        '/api/activities/goals/{goal_id}/',
+        '/api/activities/goals/?fields=goal_type,target_value',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='plan_check', email='plan_check@example.com', password='plan-check-pass'
+        )
+        other = User.objects.create_user(
+            username='plan_other', email='plan_other@example.com', password='plan-check-pass'
+        )
+        types = [choice for choice, _ in Activity.ACTIVITY_TYPES]
+        start = date(2024, 1, 1)
+        for owner in (cls.user, other):
+            for i in range(60):
+                Activity.objects.create(
+                    user=owner,
+                    activity_type=types[i % len(types)],
+                    duration=30 + i,
+                    distance=Decimal('5.00'),
+                    calories_burned=300,
+                    date=start + timedelta(days=i * 3),
+                )
+        cls.goal = Goal.objects.create(
+            user=cls.user,
+            goal_type='distance',
+            target_value=Decimal('100'),
+            period='monthly',
+            start_date=start,
+            end_date=start + timedelta(days=30),
+        )
+        # Leaves a tombstone for the sync endpoint to read
+        Activity.objects.filter(user=cls.user).last().delete()
+        # No ANALYZE on purpose: with a handful of rows the planner would rightly
+        # prefer scans, while without statistics it assumes large tables.
+        cls.activity = Activity.objects.filter(user=cls.user).first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def selects(self, url):
+        """The (sql, params) of every SELECT issued by GET ``url``."""
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = self.client.get(url)
+            if response.streaming:
+                # Streaming responses only query while being consumed
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        return [(sql, params) for sql, params in statements if sql.lstrip().upper().startswith('SELECT')]
+
+    def test_endpoints_use_indexes(self):
+        scan = re.compile(r'\bSCAN (%s)\b' % '|'.join(self.HOT_TABLES))
+        sync_token = sync.changes(self.user)['sync_token']
+        for template in self.ENDPOINTS:
+            url = template.format(activity_id=self.activity.pk, goal_id=self.goal.pk, sync_token=sync_token)
+            with self.subTest(url=url):
+                for sql, params in self.selects(url):
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                        plan = [row[-1] for row in cursor.fetchall()]
+                    scans = [line for line in plan if scan.search(line)]
+                    self.assertFalse(scans, f'{sql}\n' + '\n'.join(plan))
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheInvalidationTests(TestCase):
+    """Every Activity/Goal write path (API, bulk ingestion, ORM and admin) invalidates cached reads."""
+
+    # Cached reads that every write below must invalidate
+    READS = {
+        'activity_metrics': '/api/activities/metrics/',
+        'activity_history': '/api/activities/history/?page_size=5',
+        'activity_trends': '/api/activities/trends/?start_date=2024-01-01&end_date=2024-01-31',
+        'goal_list': '/api/activities/goals/',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cache_check', email='cache_check@example.com', password='cache-check-pass'
+        )
+        cls.admin_user = User.objects.create_superuser(
+            username='cache_admin', email='cache_admin@example.com', password='cache-check-pass'
+        )
+        cls.activity = Activity.objects.create(
+            user=cls.user, activity_type='running', duration=30,
+            distance=Decimal('5.00'), calories_burned=300, date=date(2024, 1, 10),
+        )
+        cls.goal = Goal.objects.create(
+            user=cls.user, goal_type='distance', target_value=Decimal('50'), period='monthly',
+            start_date=date(2024, 1, 1), end_date=date(2024, 1, 31),
+        )
+
+    def setUp(self):
+        caches['default'].clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.admin = Client()
+        self.admin.force_login(self.admin_user)
+
+    def write_paths(self):
+        api, admin, activity, goal = self.api, self.admin, self.activity, self.goal
+
+        def admin_change_activity():
+            return admin.post(f'/admin/activities/activity/{activity.pk}/change/', {
+                'user': activity.user_id, 'activity_type': 'cycling', 'date': '2024-01-10',
+                'duration': 45, 'distance': '12.00', 'calories_burned': 400, 'notes': 'admin',
+            })
+
+        def admin_change_goal():
+            return admin.post(f'/admin/activities/goal/{goal.pk}/change/', {
+                'user': goal.user_id, 'goal_type': 'distance', 'target_value': '75',
+                'period': 'monthly', 'activity_type': '', 'start_date': '2024-01-01',
+                'end_date': '2024-01-31', 'is_active': 'on',
+            })
+
+        def admin_delete_selected():
+            extra = Activity.objects.create(
+                user=activity.user, activity_type='yoga', duration=20, date=date(2024, 1, 12),
+            )
+            return admin.post('/admin/activities/activity/', {
+                'action': 'delete_selected', '_selected_action': [extra.pk], 'post': 'yes',
+            })
+
+        def orm_save():
+            activity.refresh_from_db()
+            activity.notes = 'orm edit'
+            activity.save()
+
+        return [
+            ('API create activity', lambda: api.post('/api/activities/', {
+                'activity_type': 'walking', 'duration': 15, 'date': '2024-01-11',
+            })),
+            ('API update activity', lambda: api.patch(f'/api/activities/{activity.pk}/', {'duration': 35})),
+            ('API bulk create', lambda: api.post(
+                '/api/activities/bulk/',
+                b'[{"activity_type": "swimming", "duration": 25, "date": "2024-01-13"}]',
+                content_type='application/json',
+            )),
+            ('API create goal', lambda: api.post('/api/activities/goals/', {
+                'goal_type': 'duration', 'target_value': '300', 'period': 'weekly',
+                'start_date': '2024-01-01', 'end_date': '2024-01-07',
+            })),
+            ('API update goal', lambda: api.put(f'/api/activities/goals/{goal.pk}/', {
+                'goal_type': 'distance', 'target_value': '60', 'period': 'monthly',
+                'start_date': '2024-01-01', 'end_date': '2024-01-31',
+            })),
+            ('ORM save', orm_save),
+            ('admin change activity', admin_change_activity),
+            ('admin change goal', admin_change_goal),
+            ('admin delete_selected', admin_delete_selected),
+            ('API delete goal', lambda: api.delete(f'/api/activities/goals/{goal.pk}/')),
+            ('API delete activity', lambda: api.delete(f'/api/activities/{activity.pk}/')),
+        ]
+
+    def test_writes_invalidate_cached_reads(self):
+        # The paths run in order against the same rows, ending with the deletes
+        for label, write in self.write_paths():
+            with self.subTest(write=label):
+                response_cache.reset_stats()
+                for url in self.READS.values():
+                    self.api.get(url)
+                    self.api.get(url)
+                warm = response_cache.stats()
+                self.assertTrue(all(warm.get(name, {}).get('hits') for name in self.READS), warm)
+
+                response = write()
+                if response is not None:
+                    self.assertLess(response.status_code, 400, label)
+
+                response_cache.reset_stats()
+                for url in self.READS.values():
+                    self.api.get(url)
+                stale = [name for name in self.READS if response_cache.stats().get(name, {}).get('hits')]
+                self.assertEqual(stale, [])
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class GoalListQueryCountTests(TestCase):
+    """The goal list must cost the same number of queries however many goals it returns."""
+
+    # The data version for the ETag, the page COUNT and the goals with their user
+    QUERIES = 3
+
+    GOALS = [
+        ('distance', 'monthly', 'running'),
+        ('duration', 'weekly', ''),
+        ('calories', 'daily', ''),
+        ('frequency', 'yearly', 'cycling'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='query_check', email='query_check@example.com', password='query-check-pass'
+        )
+        start = date(2024, 1, 1)
+        for offset in range(30):
+            Activity.objects.create(
+                user=cls.user, activity_type=('running', 'cycling', 'yoga')[offset % 3],
+                duration=30 + offset, date=start + timedelta(days=offset),
+            )
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def add_goals(self, total):
+        start = date(2024, 1, 1)
+        for index in range(Goal.objects.filter(user=self.user).count(), total):
+            goal_type, period, activity_type = self.GOALS[index % len(self.GOALS)]
+            Goal.objects.create(
+                user=self.user, goal_type=goal_type, target_value=100, period=period,
+                activity_type=activity_type, start_date=start + timedelta(days=index % 28),
+                end_date=start + timedelta(days=index % 28 + 30),
+            )
+
+    def test_query_count_is_constant(self):
+        for total in (1, 10, 50):
+            self.add_goals(total)
+            with self.subTest(goals=total), self.assertNumQueries(self.QUERIES):
+                response = self.api.get('/api/activities/goals/')
+                self.assertEqual(response.data['count'], total)
+
+
+class LeaderboardWriteTests(TestCase):
+    """Leaderboard entries follow activity writes with a fixed number of statements."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='board_check', email='board_check@example.com', password='board-check-pass'
+        )
+
+    def entries(self):
+        return sorted(LeaderboardEntry.objects.values_list(
+            'user_id', 'window', 'period_start', 'activity_type',
+            'activity_count', 'total_distance', 'total_calories',
+        ))
+
+    def test_fan_out_is_one_upsert(self):
+        activity = Activity.objects.create(
+            user=self.user, activity_type='running', duration=30,
+            distance=Decimal('5.00'), calories_burned=300, date=date(2024, 1, 31),
+        )
+        # Moving the activity to another type, week and month touches every
+        # window of both boards: inserts, increments and emptied entries
+        moved = activity.snapshot()._replace(activity_type='cycling', date=date(2024, 2, 5))
+        deltas = rollups.collect_deltas(removed=[activity.snapshot()], added=[moved])
+        with self.assertNumQueries(2):
+            leaderboard.apply_deltas(deltas)
+        # rebuild() reads the rollups
+        rollups.apply_deltas(deltas)
+
+        stored = self.entries()
+        leaderboard.rebuild()
+        self.assertEqual(stored, self.entries())
+
+
+class GoalProgressTests(TestCase):
+    """Stored goal progress follows activity writes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='progress_check', email='progress_check@example.com', password='progress-check-pass'
+        )
+
+    def test_target_that_does_not_divide_evenly(self):
+        goals = [
+            Goal.objects.create(
+                user=self.user, goal_type='frequency', target_value=target, period='monthly',
+                start_date=date(2024, 1, 1), end_date=date(2024, 1, 31),
+            )
+            for target in (3, Decimal('3.00'))
+        ]
+        Activity.objects.create(user=self.user, activity_type='running', duration=30, date=date(2024, 1, 10))
+
+        goals = list(Goal.objects.filter(pk__in=[goal.pk for goal in goals]))
+        for goal in goals:
+            self.assertEqual(goal.current_value, Decimal('1.00'))
+            self.assertEqual(goal.percentage, Decimal('33.33'))
+            self.assertIsNone(goal.completed_at)
+        self.assertEqual(progress.stale(goals), [])
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class WriteQueryCountTests(TestCase):
+    """
+    Activity and goal writes cost a fixed number of queries, however many
+    rollup rows, leaderboard entries and goals they update.
+    """
+
+    # Counted inside the test transaction, where Activity.save() opens a
+    # savepoint pair. An activity write is the activity statement, one rollup
+    # upsert, one leaderboard upsert, the goals SELECT and bulk UPDATE and the
+    # data version UPDATE; writes that can empty counter rows add one DELETE
+    # per counter table. Update and delete load the activity first; delete
+    # also writes a tombstone and update reads the user back for the response.
+    BUDGETS = {
+        'activity create': 8,
+        'activity update': 12,
+        'activity delete': 10,
+        'goal create': 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='write_check', email='write_check@example.com', password='write-check-pass'
+        )
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def add_goals(self, total):
+        # Duration goals covering the month, so every write below moves them
+        for _ in range(Goal.objects.filter(user=self.user).count(), total):
+            Goal.objects.create(
+                user=self.user, goal_type='duration', target_value=500, period='monthly',
+                start_date=date(2024, 1, 1), end_date=date(2024, 1, 31),
+            )
+
+    def writes(self):
+        activity = Activity.objects.create(user=self.user, activity_type='running', duration=30, date=date(2024, 1, 10))
+        return [
+            ('activity create', lambda: self.api.post('/api/activities/', {
+                'activity_type': 'running', 'duration': 40, 'distance': '6.50', 'date': '2024-01-15',
+            }, format='json')),
+            ('activity update', lambda: self.api.patch(
+                f'/api/activities/{activity.pk}/', {'duration': 55, 'activity_type': 'walking'}, format='json'
+            )),
+            ('activity delete', lambda: self.api.delete(f'/api/activities/{activity.pk}/')),
+            ('goal create', lambda: self.api.post('/api/activities/goals/', {
+                'goal_type': 'duration', 'target_value': '300', 'period': 'weekly',
+                'start_date': '2024-01-01', 'end_date': '2024-01-07',
+            }, format='json')),
+        ]
+
+    def test_writes_stay_within_budget(self):
+        for total in (1, 50):
+            self.add_goals(total)
+            for label, write in self.writes():
+                with self.subTest(goals=total, write=label), self.assertNumQueries(self.BUDGETS[label]):
+                    response = write()
+                    self.assertLess(response.status_code, 400)
+
+
+class BulkIngestTests(TestCase):
+    """Bulk uploads store the same rows and derived data as single creates."""
+
+    ROWS = [
+        {'activity_type': 'running', 'duration': 30, 'distance': '5.5', 'date': '2024-01-02', 'notes': 'easy'},
+        {'activity_type': 'yoga', 'duration': 20, 'date': '2024-01-03'},
+        {'activity_type': 'cycling', 'duration': 45, 'distance': 12, 'calories_burned': '300', 'date': '2024-01-03'},
+    ]
+    COLUMNS = ('activity_type', 'duration', 'distance', 'calories_burned', 'date', 'notes')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.bulk_user = User.objects.create_user(
+            username='bulk_check', email='bulk_check@example.com', password='bulk-check-pass'
+        )
+        cls.single_user = User.objects.create_user(
+            username='single_check', email='single_check@example.com', password='bulk-check-pass'
+        )
+
+    def rows(self, user):
+        return list(Activity.objects.filter(user=user).order_by('pk').values_list(*self.COLUMNS))
+
+    def test_bulk_rows_match_single_creates(self):
+        api = APIClient()
+        api.force_authenticate(self.bulk_user)
+        response = api.post('/api/activities/bulk/?chunk_size=2', self.ROWS, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], len(self.ROWS))
+
+        api.force_authenticate(self.single_user)
+        for row in self.ROWS:
+            self.assertEqual(api.post('/api/activities/', row, format='json').status_code, 201)
+
+        self.assertEqual(self.rows(self.bulk_user), self.rows(self.single_user))
+        created = Activity.objects.filter(user=self.bulk_user).first()
+        self.assertIsNotNone(created.created_at)
+        self.assertEqual(created.created_at, created.updated_at)
+
+        stored = sorted(DailyActivityRollup.objects.values_list(
+            'user_id', 'date', 'activity_type', 'activity_count', 'total_duration', 'total_distance', 'total_calories',
+        ))
+        rollups.rebuild()
+        self.assertEqual(stored, sorted(DailyActivityRollup.objects.values_list(
+            'user_id', 'date', 'activity_type', 'activity_count', 'total_duration', 'total_distance', 'total_calories',
+        )))
@@ -0,0 +1,154 @@
+"""
+Time-bucketed activity trends.
+
+A trend series is computed in one grouped query: rows are truncated to the
+start of their day, week (Monday), month or year with Django's Trunc and
+summed per bucket (and per activity type), over the daily rollups unless
+ACTIVITY_METRICS_SOURCE says otherwise. Buckets without activities are
+filled in with zeros here, so clients always get a dense series.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Trunc
+
+from .metrics import _filter
+from .models import Activity, DailyActivityRollup
+
+BUCKETS = ('day', 'week', 'month', 'year')
+
+# Window used when start_date is not given, counted back from end_date
+DEFAULT_BUCKET_COUNTS = {'day': 30, 'week': 52, 'month': 12, 'year': 5}
+
+MAX_BUCKETS = 1000
+
+
+def bucket_start(day, bucket):
+    """First day of the ``bucket`` containing ``day``."""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    if bucket == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def next_bucket(start, bucket):
+    """First day of the bucket after the one starting on ``start``."""
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    if bucket == 'year':
+        return date(start.year + 1, 1, 1)
+    return start + timedelta(days=1)
+
+
+def window(bucket, start_date=None, end_date=None):
+    """
+    Return the list of bucket start dates covering start_date..end_date,
+    widened to whole buckets. Without start_date the window is the last
+    DEFAULT_BUCKET_COUNTS[bucket] buckets up to end_date (default today).
+    Raises ValueError if the window holds more than MAX_BUCKETS buckets.
+    """
+    end = end_date or date.today()
+    if start_date is None:
+        start = bucket_start(end, bucket)
+        for _ in range(DEFAULT_BUCKET_COUNTS[bucket] - 1):
+            start = bucket_start(start - timedelta(days=1), bucket)
+    else:
+        start = bucket_start(start_date, bucket)
+
+    starts = []
+    while start <= end:
+        starts.append(start)
+        if len(starts) > MAX_BUCKETS:
+            raise ValueError(f'The date range spans more than {MAX_BUCKETS} {bucket} buckets.')
+        start = next_bucket(start, bucket)
+    return starts
+
+
+def _period(bucket):
+    # Plain dates are already day buckets; Trunc would only add work
+    if bucket == 'day':
+        return F('date')
+    return Trunc('date', bucket, output_field=DateField())
+
+
+def grouped_activities(queryset, bucket, by_type):
+    columns = ['period', 'activity_type'] if by_type else ['period']
+    return queryset.annotate(period=_period(bucket)).values(*columns).annotate(
+        count=Count('id'),
+        duration=Sum('duration'),
+        distance=Sum('distance'),
+        calories=Sum('calories_burned'),
+    ).order_by()
+
+
+def grouped_rollups(queryset, bucket, by_type):
+    columns = ['period', 'activity_type'] if by_type else ['period']
+    return queryset.annotate(period=_period(bucket)).values(*columns).annotate(
+        count=Sum('activity_count'),
+        duration=Sum('total_duration'),
+        distance=Sum('total_distance'),
+        calories=Sum('total_calories'),
+    ).order_by()
+
+
+def _zero():
+    return {
+        'count': 0,
+        'total_duration': 0,
+        'total_distance': Decimal('0'),
+        'total_calories': 0,
+    }
+
+
+def _add(totals, row):
+    totals['count'] += row['count'] or 0
+    totals['total_duration'] += row['duration'] or 0
+    totals['total_distance'] += row['distance'] or Decimal('0')
+    totals['total_calories'] += row['calories'] or 0
+
+
+def compute(user, bucket, starts, activity_type=None, by_type=False, source=None):
+    """
+    Return one dict per bucket in ``starts`` (from window()) with the
+    count and duration, distance and calories totals, plus a ``by_type``
+    breakdown over every type seen in the window when ``by_type`` is set.
+    """
+    source = source or getattr(settings, 'ACTIVITY_METRICS_SOURCE', 'rollups')
+    end_date = next_bucket(starts[-1], bucket) - timedelta(days=1)
+    if source == 'activities':
+        rows = grouped_activities(
+            _filter(Activity.objects.all(), user, starts[0], end_date, activity_type), bucket, by_type
+        )
+    else:
+        rows = grouped_rollups(
+            _filter(DailyActivityRollup.objects.all(), user, starts[0], end_date, activity_type),
+            bucket, by_type
+        )
+
+    series = {start: dict(period_start=start, **_zero()) for start in starts}
+    types = set()
+    per_type = {}
+    for row in rows:
+        period = row['period']
+        point = series.get(period)
+        if point is None:
+            continue
+        _add(point, row)
+        if by_type:
+            types.add(row['activity_type'])
+            _add(per_type.setdefault((period, row['activity_type']), _zero()), row)
+
+    if by_type:
+        for start, point in series.items():
+            point['by_type'] = {
+                activity_type: per_type.get((start, activity_type)) or _zero()
+                for activity_type in sorted(types)
+            }
+    return list(series.values())
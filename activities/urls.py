@@ -1,20 +1,28 @@
 from django.urls import path
 from .views import (
     ActivityListCreateView,
+    ActivityBulkCreateView,
     ActivityDetailView,
     GoalListCreateView,
     GoalDetailView,
     activity_metrics,
+    activity_trends,
     activity_history,
+    activity_export,
+    activity_sync,
     leaderboard,
 )
 
 urlpatterns = [
     path('', ActivityListCreateView.as_view(), name='activity-list-create'),
+    path('bulk/', ActivityBulkCreateView.as_view(), name='activity-bulk-create'),
     path('<int:pk>/', ActivityDetailView.as_view(), name='activity-detail'),
     path('goals/', GoalListCreateView.as_view(), name='goal-list-create'),
     path('goals/<int:pk>/', GoalDetailView.as_view(), name='goal-detail'),
     path('metrics/', activity_metrics, name='activity-metrics'),
+    path('trends/', activity_trends, name='activity-trends'),
     path('history/', activity_history, name='activity-history'),
+    path('export/', activity_export, name='activity-export'),
+    path('sync/', activity_sync, name='activity-sync'),
     path('leaderboard/', leaderboard, name='leaderboard'),
 ]
\ No newline at end of file
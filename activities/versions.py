@@ -0,0 +1,44 @@
+"""
+Per-user data versions.
+
+Every Activity or Goal write bumps the writer's UserDataVersion row. The
+(version, updated_at) pair identifies the state of a user's data, so read
+endpoints can answer conditional requests from one primary key lookup
+instead of re-running their queries.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import UserDataVersion
+
+
+def bump(user_ids):
+    """Increment the data version of every user in ``user_ids``."""
+    now = timezone.now()
+    for user_id in set(user_ids):
+        rows = UserDataVersion.objects.filter(user_id=user_id)
+        if rows.update(version=F('version') + 1, updated_at=now):
+            continue
+        try:
+            with transaction.atomic():
+                UserDataVersion.objects.create(user_id=user_id, version=1, updated_at=now)
+        except IntegrityError:
+            # Another request created the row first
+            rows.update(version=F('version') + 1, updated_at=now)
+
+
+def current(user_id):
+    """Return ``(version, updated_at)``; ``(0, None)`` if the user never wrote."""
+    row = UserDataVersion.objects.filter(user_id=user_id).values_list(
+        'version', 'updated_at'
+    ).first()
+    return row or (0, None)
+
+
+def for_request(request):
+    """current() for ``request.user``, looked up at most once per request."""
+    http_request = getattr(request, '_request', request)
+    if not hasattr(http_request, 'data_version'):
+        http_request.data_version = current(request.user.id)
+    return http_request.data_version
@@ -1,24 +1,38 @@
-from rest_framework import generics, status
+from rest_framework import exceptions, generics, status
+from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.authentication import SessionAuthentication
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
-from django.db.models import Sum, Avg, Count
+from django.utils import timezone
 from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
-from decimal import Decimal
+from io import BytesIO
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
 from .models import Activity, Goal
 from .serializers import (
     ActivitySerializer, 
     ActivityCreateSerializer, 
     GoalSerializer,
-    ActivityMetricsSerializer
+    ActivityMetricsSerializer,
+    ActivityRowSerializer,
+    TrendPointSerializer,
+    requested_fields
 )
+from .conditional import user_data_conditional
 from .filters import ActivityFilter
-from users.authentication import APIKeyAuthentication
+from .response_cache import cached_user_response
+from .ingest import BodyParseError, BulkIngestor, row_iterator
+from .pagination import KeysetPagination
+from . import export
+from . import leaderboard as leaderboard_store
+from . import metrics as metrics_engine
+from . import sync
+from . import trends
+from users.authentication import APIKeyAuthentication, JWTAuthentication, SessionAuthentication
 
 class ActivityListCreateView(generics.ListCreateAPIView):
     # Support both JWT and API Key authentication
@@ -29,6 +43,16 @@ class ActivityListCreateView(generics.ListCreateAPIView):
     ordering_fields = ['date', 'duration', 'calories_burned', 'distance']
     ordering = ['-date']
     
+    @property
+    def paginator(self):
+        # Clients that send ?cursor= get keyset pagination (no COUNT/OFFSET)
+        if not hasattr(self, '_paginator'):
+            if KeysetPagination.cursor_query_param in self.request.query_params:
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
+    
     def get_queryset(self):
         # For API key users (developers)
         if hasattr(self.request.user, 'developer'):
@@ -38,7 +62,7 @@ class ActivityListCreateView(generics.ListCreateAPIView):
         
         # For JWT authenticated users
         if self.request.user.is_authenticated and hasattr(self.request.user, 'id'):
-            return Activity.objects.filter(user=self.request.user)
+            return Activity.objects.filter(user_id=self.request.user.id)
         
         return Activity.objects.none()
     
@@ -47,6 +71,18 @@ class ActivityListCreateView(generics.ListCreateAPIView):
             return ActivityCreateSerializer
         return ActivitySerializer
     
+    def list(self, request, *args, **kwargs):
+        # Serialize straight from values() rows; same output as ActivitySerializer
+        row_serializer = ActivityRowSerializer(
+            username=getattr(request.user, 'username', None),
+            fields=requested_fields(request, ActivitySerializer)
+        )
+        queryset = row_serializer.project(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.serialize(page))
+        return Response(row_serializer.serialize(queryset))
+    
     def perform_create(self, serializer):
         # For API key authentication (developers)
         if hasattr(self.request.user, 'developer'):
@@ -68,11 +104,83 @@ class ActivityListCreateView(generics.ListCreateAPIView):
         
         # For JWT authenticated users
         if self.request.user.is_authenticated and hasattr(self.request.user, 'id'):
-            serializer.save(user=self.request.user)
+            serializer.save(user_id=self.request.user.id)
         else:
             raise PermissionError("Unable to create activity: invalid user")
 
-class ActivityDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ActivityBulkCreateView(APIView):
+    """
+    Create many activities in one request.
+    
+    The body is a JSON array (application/json), one JSON object per line
+    (application/x-ndjson) or CSV with a header row (text/csv), using the
+    same fields as a single POST. Rows are validated individually and saved
+    in chunks of ?chunk_size= rows; invalid rows are reported by row number
+    and do not stop the others from being saved.
+    """
+    authentication_classes = [JWTAuthentication, APIKeyAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, *args, **kwargs):
+        rows = row_iterator(request.content_type, request.stream or BytesIO())
+        if rows is None:
+            raise exceptions.UnsupportedMediaType(request.content_type)
+        
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', 0))
+        except ValueError:
+            chunk_size = 0
+        chunk_size = min(max(chunk_size, 0), settings.BULK_INGEST_MAX_CHUNK_SIZE)
+        
+        # API key users get a validation-only dry run, like the other demo paths
+        is_developer = hasattr(request.user, 'developer')
+        ingestor = BulkIngestor(
+            user_id=None if is_developer else request.user.id,
+            chunk_size=chunk_size or None,
+            save=not is_developer,
+        )
+        
+        try:
+            ingestor.ingest(rows)
+        except BodyParseError as exc:
+            return Response(
+                {"error": str(exc), **ingestor.summary()},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        response_data = ingestor.summary()
+        if is_developer:
+            response_data['message'] = "Bulk activity demo for API key users: rows were validated but not saved."
+            response_data['developer'] = request.user.developer.name
+        return Response(
+            response_data,
+            status=status.HTTP_201_CREATED if ingestor.created else status.HTTP_200_OK
+        )
+
+class SparseFieldsViewMixin:
+    """
+    ``?fields=`` support for GET requests of views whose serializer uses
+    SparseFieldsMixin: trims the output and the columns that are read.
+    """
+    
+    @property
+    def sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = None
+            if self.request.method == 'GET':
+                self._sparse_fields = requested_fields(self.request, self.serializer_class)
+        return self._sparse_fields
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return self.serializer_class.project(queryset, self.sparse_fields)
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.sparse_fields
+        return context
+
+class ActivityDetailView(SparseFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     authentication_classes = [JWTAuthentication, APIKeyAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = ActivitySerializer
@@ -81,10 +189,10 @@ class ActivityDetailView(generics.RetrieveUpdateDestroyAPIView):
         if hasattr(self.request.user, 'developer'):
             return Activity.objects.none()
         if self.request.user.is_authenticated and hasattr(self.request.user, 'id'):
-            return Activity.objects.filter(user=self.request.user)
+            return Activity.objects.filter(user_id=self.request.user.id)
         return Activity.objects.none()
 
-class GoalListCreateView(generics.ListCreateAPIView):
+class GoalListCreateView(SparseFieldsViewMixin, generics.ListCreateAPIView):
     authentication_classes = [JWTAuthentication, APIKeyAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = GoalSerializer
@@ -93,9 +201,15 @@ class GoalListCreateView(generics.ListCreateAPIView):
         if hasattr(self.request.user, 'developer'):
             return Goal.objects.none()
         if self.request.user.is_authenticated and hasattr(self.request.user, 'id'):
-            return Goal.objects.filter(user=self.request.user)
+            return Goal.objects.filter(user_id=self.request.user.id).select_related('user')
         return Goal.objects.none()
     
+    @method_decorator(user_data_conditional)
+    @method_decorator(cached_user_response('goal_list'))
+    def list(self, request, *args, **kwargs):
+        # Progress is read from the stored goal columns, no aggregation here
+        return super().list(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         if hasattr(self.request.user, 'developer'):
             # Return demo response for API key users
@@ -116,11 +230,11 @@ class GoalListCreateView(generics.ListCreateAPIView):
             }, status=status.HTTP_201_CREATED)
         
         if self.request.user.is_authenticated and hasattr(self.request.user, 'id'):
-            serializer.save(user=self.request.user)
+            serializer.save(user_id=self.request.user.id)
         else:
             raise PermissionError("Unable to create goal: invalid user")
 
-class GoalDetailView(generics.RetrieveUpdateDestroyAPIView):
+class GoalDetailView(SparseFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     authentication_classes = [JWTAuthentication, APIKeyAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = GoalSerializer
@@ -129,12 +243,14 @@ class GoalDetailView(generics.RetrieveUpdateDestroyAPIView):
         if hasattr(self.request.user, 'developer'):
             return Goal.objects.none()
         if self.request.user.is_authenticated and hasattr(self.request.user, 'id'):
-            return Goal.objects.filter(user=self.request.user)
+            return Goal.objects.filter(user_id=self.request.user.id).select_related('user')
         return Goal.objects.none()
 
 @api_view(['GET'])
 @authentication_classes([JWTAuthentication, APIKeyAuthentication, SessionAuthentication])
 @permission_classes([IsAuthenticated])
+@user_data_conditional
+@cached_user_response('activity_metrics')
 def activity_metrics(request):
     """
     Get activity metrics for the authenticated user.
@@ -144,38 +260,135 @@ def activity_metrics(request):
     - activity_type: activity type to filter by
     """
     # For API key users (developers), return demo data
+    if hasattr(request.user, 'developer'):
+        return metrics_demo(request)
+    
+    # For JWT authenticated users
+    if not (request.user.is_authenticated and hasattr(request.user, 'id')):
+        return Response(
+            {"error": "Authentication required"}, 
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    # One grouped query, over the daily rollups unless configured otherwise
+    metrics = metrics_engine.compute(request.user, **metrics_filters(request))
+    
+    serializer = ActivityMetricsSerializer(metrics)
+    return Response(serializer.data)
+
+def metrics_demo(request):
+    """Demo activity_metrics response for API key users."""
+    return Response({
+        "message": "Welcome to the Fitness Tracker API!",
+        "developer": request.user.developer.name,
+        "api_usage": "This endpoint would return activity metrics for authenticated users.",
+        "note": "To use this endpoint with real data, integrate with your user system.",
+        "demo_metrics": {
+            "total_activities": 25,
+            "total_duration": 1250,
+            "total_distance": "125.50",
+            "total_calories": 8750,
+            "average_duration": "50.00",
+            "most_common_activity": "running",
+            "activities_by_type": {
+                "running": 12,
+                "cycling": 8,
+                "swimming": 5
+            }
+        }
+    })
+
+def metrics_filters(request):
+    """Return the metrics_engine.compute() filters given in the query string."""
+    # Apply date filters
+    start_date = request.query_params.get('start_date')
+    end_date = request.query_params.get('end_date')
+    activity_type = request.query_params.get('activity_type')
+    
+    if start_date:
+        start_date = parse_date(start_date)
+    
+    if end_date:
+        end_date = parse_date(end_date)
+    
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'activity_type': activity_type,
+    }
+
+def _trends_end_date(request):
+    # The default window ends today, so it moves without any write
+    return request.query_params.get('end_date') or timezone.localdate().isoformat()
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication, APIKeyAuthentication, SessionAuthentication])
+@permission_classes([IsAuthenticated])
+@user_data_conditional(vary=_trends_end_date)
+@cached_user_response('activity_trends', vary=_trends_end_date)
+def activity_trends(request):
+    """
+    Get activity totals per day, week, month or year, with empty buckets
+    filled in with zeros.
+    Optional query parameters:
+    - bucket: day, week (default), month or year
+    - start_date: YYYY-MM-DD (defaults to 30 days, 52 weeks, 12 months or 5 years back)
+    - end_date: YYYY-MM-DD (defaults to today)
+    - activity_type: activity type to filter by
+    - by_type: true to break every bucket down by activity type
+    """
     if hasattr(request.user, 'developer'):
         return Response({
-            "message": "Welcome to the Fitness Tracker API!",
+            "message": "Activity trends endpoint",
             "developer": request.user.developer.name,
-            "api_usage": "This endpoint would return activity metrics for authenticated users.",
-            "note": "To use this endpoint with real data, integrate with your user system.",
-            "demo_metrics": {
-                "total_activities": 25,
-                "total_duration": 1250,
-                "total_distance": "125.50",
-                "total_calories": 8750,
-                "average_duration": "50.00",
-                "most_common_activity": "running",
-                "activities_by_type": {
-                    "running": 12,
-                    "cycling": 8,
-                    "swimming": 5
-                }
-            }
+            "note": "This endpoint would return per-bucket activity totals for authenticated users.",
+            "buckets": list(trends.BUCKETS),
+            "demo_series": [
+                {"period_start": "2024-01-01", "count": 4, "total_duration": 180,
+                 "total_distance": "24.50", "total_calories": 1650},
+                {"period_start": "2024-01-08", "count": 0, "total_duration": 0,
+                 "total_distance": "0.00", "total_calories": 0}
+            ]
         })
     
-    # For JWT authenticated users
     if not (request.user.is_authenticated and hasattr(request.user, 'id')):
         return Response(
             {"error": "Authentication required"}, 
             status=status.HTTP_401_UNAUTHORIZED
         )
     
-    user = request.user
-    activities = Activity.objects.filter(user=user)
+    bucket = request.query_params.get('bucket', 'week')
+    if bucket not in trends.BUCKETS:
+        return Response(
+            {"error": f"bucket must be one of: {', '.join(trends.BUCKETS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    # Apply date filters
+    activity_type = request.query_params.get('activity_type')
+    by_type = request.query_params.get('by_type', '').lower() in ('1', 'true', 'yes')
+    try:
+        start_date = parse_date(request.query_params.get('start_date', ''))
+        end_date = parse_date(request.query_params.get('end_date', '')) or timezone.localdate()
+        if start_date and start_date > end_date:
+            raise ValueError('start_date must not be after end_date.')
+        starts = trends.window(bucket, start_date, end_date)
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # One grouped query, over the daily rollups unless configured otherwise
+    series = trends.compute(
+        request.user, bucket, starts, activity_type=activity_type, by_type=by_type
+    )
+    return Response({
+        'bucket': bucket,
+        'start_date': starts[0],
+        'end_date': trends.next_bucket(starts[-1], bucket) - timedelta(days=1),
+        'activity_type': activity_type,
+        'series': TrendPointSerializer(series, many=True).data,
+    })
+
+def filter_history(request, activities):
+    """Apply the start_date, end_date and activity_type query filters."""
     start_date = request.query_params.get('start_date')
     end_date = request.query_params.get('end_date')
     activity_type = request.query_params.get('activity_type')
@@ -192,51 +405,18 @@ def activity_metrics(request):
     
     if activity_type:
         activities = activities.filter(activity_type=activity_type)
-    
-    # Calculate metrics
-    metrics = activities.aggregate(
-        total_duration=Sum('duration'),
-        total_distance=Sum('distance'),
-        total_calories=Sum('calories_burned'),
-        average_duration=Avg('duration'),
-        total_activities=Count('id')
-    )
-    
-    # Handle None values
-    for key, value in metrics.items():
-        if value is None:
-            if 'total' in key or key == 'total_activities':
-                metrics[key] = 0
-            elif 'average' in key:
-                metrics[key] = Decimal('0.00')
-    
-    # Get most common activity
-    most_common = activities.values('activity_type').annotate(
-        count=Count('activity_type')
-    ).order_by('-count').first()
-    
-    metrics['most_common_activity'] = (
-        most_common['activity_type'] if most_common else 'None'
-    )
-    
-    # Get activities by type
-    activities_by_type = dict(
-        activities.values('activity_type').annotate(
-            count=Count('activity_type')
-        ).values_list('activity_type', 'count')
-    )
-    
-    metrics['activities_by_type'] = activities_by_type
-    
-    serializer = ActivityMetricsSerializer(metrics)
-    return Response(serializer.data)
+    return activities
 
 @api_view(['GET'])
 @authentication_classes([JWTAuthentication, APIKeyAuthentication, SessionAuthentication])
 @permission_classes([IsAuthenticated])
+@user_data_conditional
+@cached_user_response('activity_history')
 def activity_history(request):
     """
     Get activity history with filters, sorting, and pagination.
+    Send ?cursor= (empty for the first page) to use keyset pagination,
+    then follow next_cursor; otherwise page/page_size are used.
     """
     if hasattr(request.user, 'developer'):
         return Response({
@@ -268,25 +448,18 @@ def activity_history(request):
             status=status.HTTP_401_UNAUTHORIZED
         )
     
-    activities = Activity.objects.filter(user=request.user)
-    
-    # Apply filters
-    start_date = request.query_params.get('start_date')
-    end_date = request.query_params.get('end_date')
-    activity_type = request.query_params.get('activity_type')
-    
-    if start_date:
-        start_date = parse_date(start_date)
-        if start_date:
-            activities = activities.filter(date__gte=start_date)
-    
-    if end_date:
-        end_date = parse_date(end_date)
-        if end_date:
-            activities = activities.filter(date__lte=end_date)
+    activities = filter_history(request, Activity.objects.filter(user_id=request.user.id))
+    row_serializer = ActivityRowSerializer(
+        username=request.user.username,
+        fields=requested_fields(request, ActivitySerializer)
+    )
+    activities = row_serializer.project(activities)
     
-    if activity_type:
-        activities = activities.filter(activity_type=activity_type)
+    # Keyset mode: ?cursor= skips the COUNT and the OFFSET scan
+    if KeysetPagination.cursor_query_param in request.query_params:
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(activities, request)
+        return paginator.get_paginated_response(row_serializer.serialize(page))
     
     # Apply sorting
     ordering = request.query_params.get('ordering', '-date')
@@ -300,37 +473,76 @@ def activity_history(request):
     paginator = Paginator(activities, page_size)
     activities_page = paginator.get_page(page)
     
-    serializer = ActivitySerializer(activities_page, many=True)
-    
     return Response({
         'count': paginator.count,
         'next': activities_page.has_next(),
         'previous': activities_page.has_previous(),
-        'results': serializer.data
+        'results': row_serializer.serialize(activities_page)
     })
 
 @api_view(['GET'])
 @authentication_classes([JWTAuthentication, APIKeyAuthentication, SessionAuthentication])
 @permission_classes([IsAuthenticated])
-def leaderboard(request):
+def activity_export(request):
     """
-    Get leaderboard data for distance and calories.
+    Stream the full activity history as NDJSON (default) or CSV.
+    Optional query parameters:
+    - export_format: ndjson or csv
+    - start_date, end_date, activity_type: same filters as activity_history
     """
     if hasattr(request.user, 'developer'):
         return Response({
-            "message": "Leaderboard endpoint",
+            "message": "Activity export endpoint",
             "developer": request.user.developer.name,
-            "demo_leaderboard": {
-                "distance_leaderboard": [
-                    {"username": "runner_pro", "total_distance": 500.25},
-                    {"username": "fitness_fan", "total_distance": 450.75},
-                    {"username": "marathon_mike", "total_distance": 425.50}
-                ],
-                "calories_leaderboard": [
-                    {"username": "calorie_crusher", "total_calories": 15000},
-                    {"username": "burn_machine", "total_calories": 12500},
-                    {"username": "fit_fanatic", "total_calories": 11000}
-                ]
+            "note": "This endpoint would stream every activity of the authenticated user as NDJSON or CSV.",
+            "formats": list(export.FORMATS)
+        })
+    
+    if not (request.user.is_authenticated and hasattr(request.user, 'id')):
+        return Response(
+            {"error": "Authentication required"}, 
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    export_format = request.query_params.get('export_format', 'ndjson')
+    if export_format not in export.FORMATS:
+        return Response(
+            {"error": f"export_format must be one of: {', '.join(export.FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    fields = requested_fields(request, ActivitySerializer)
+    activities = filter_history(request, Activity.objects.filter(user_id=request.user.id))
+    response = StreamingHttpResponse(
+        export.stream(export_format, activities, request.user.username, fields=fields),
+        content_type=f'{export.FORMATS[export_format]}; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="activities.{export_format}"'
+    return response
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication, APIKeyAuthentication, SessionAuthentication])
+@permission_classes([IsAuthenticated])
+def activity_sync(request):
+    """
+    Get the activities and goals created, changed or deleted since a sync
+    token, for offline-first clients. Without a token everything is sent.
+    Optional query parameters:
+    - sync_token: the sync_token of the previous response
+    - limit: rows per stream (default 500, max 5000); repeat the call with
+      the new sync_token while has_more is true
+    """
+    if hasattr(request.user, 'developer'):
+        return Response({
+            "message": "Activity sync endpoint",
+            "developer": request.user.developer.name,
+            "note": "This endpoint would return the activities and goals changed since a sync token.",
+            "demo_sync": {
+                "activities": [],
+                "goals": [],
+                "deleted": {"activities": [42], "goals": []},
+                "sync_token": "demo-token",
+                "has_more": False
             }
         })
     
@@ -340,36 +552,137 @@ def leaderboard(request):
             status=status.HTTP_401_UNAUTHORIZED
         )
     
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
+    try:
+        limit = int(request.query_params.get('limit', sync.DEFAULT_LIMIT))
+    except ValueError:
+        limit = sync.DEFAULT_LIMIT
+    limit = max(1, min(limit, sync.MAX_LIMIT))
+    
+    row_serializer = ActivityRowSerializer(username=request.user.username)
+    try:
+        changes = sync.changes(
+            request.user,
+            request.query_params.get('sync_token'),
+            limit=limit,
+            activity_rows=row_serializer.project,
+            goal_rows=lambda goals: goals.select_related('user'),
+        )
+    except sync.InvalidToken:
+        return Response({"error": "Invalid sync token."}, status=status.HTTP_400_BAD_REQUEST)
+    except sync.ExpiredToken:
+        return Response(
+            {"error": "Sync token has expired; sync again without a token."},
+            status=status.HTTP_410_GONE
+        )
+    
+    deleted = {'activity': [], 'goal': []}
+    for tombstone in changes['tombstones']:
+        deleted[tombstone['kind']].append(tombstone['object_id'])
+    
+    return Response({
+        'activities': row_serializer.serialize(changes['activities']),
+        'goals': GoalSerializer(changes['goals'], many=True).data,
+        'deleted': {'activities': deleted['activity'], 'goals': deleted['goal']},
+        'sync_token': changes['sync_token'],
+        'has_more': changes['has_more'],
+    })
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication, APIKeyAuthentication, SessionAuthentication])
+@permission_classes([IsAuthenticated])
+def leaderboard(request):
+    """
+    Get leaderboard data for distance and calories.
+    Optional query parameters:
+    - window: all (default), week or month
+    - date: YYYY-MM-DD inside the week/month to show (defaults to today)
+    - activity_type: activity type to rank by
+    - limit: number of users per board (default 10, max 100)
+    """
+    if hasattr(request.user, 'developer'):
+        return leaderboard_demo(request)
+    
+    if not (request.user.is_authenticated and hasattr(request.user, 'id')):
+        return Response(
+            {"error": "Authentication required"}, 
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    params, error = leaderboard_params(request)
+    if error is not None:
+        return error
+    
+    # Read the top entries from the materialized leaderboard
+    distance_leaders = leaderboard_store.top('distance', **params)
+    calories_leaders = leaderboard_store.top('calories', **params)
+    
+    return Response(leaderboard_payload(params, distance_leaders, calories_leaders))
+
+def leaderboard_demo(request):
+    """Demo leaderboard response for API key users."""
+    return Response({
+        "message": "Leaderboard endpoint",
+        "developer": request.user.developer.name,
+        "demo_leaderboard": {
+            "distance_leaderboard": [
+                {"username": "runner_pro", "total_distance": 500.25},
+                {"username": "fitness_fan", "total_distance": 450.75},
+                {"username": "marathon_mike", "total_distance": 425.50}
+            ],
+            "calories_leaderboard": [
+                {"username": "calorie_crusher", "total_calories": 15000},
+                {"username": "burn_machine", "total_calories": 12500},
+                {"username": "fit_fanatic", "total_calories": 11000}
+            ]
+        }
+    })
+
+def leaderboard_params(request):
+    """
+    Return ``(params, None)`` with the leaderboard_store.top() keyword
+    arguments given in the query string, or ``(None, error response)``.
+    """
+    window = request.query_params.get('window', 'all')
+    if window not in leaderboard_store.WINDOWS:
+        return None, Response(
+            {"error": f"window must be one of: {', '.join(leaderboard_store.WINDOWS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    # Get top users by total distance
-    distance_leaders = User.objects.annotate(
-        total_distance=Sum('activities__distance')
-    ).exclude(total_distance__isnull=True).order_by('-total_distance')[:10]
+    activity_type = request.query_params.get('activity_type', '')
+    day = parse_date(request.query_params.get('date', '')) or timezone.localdate()
     
-    # Get top users by total calories
-    calories_leaders = User.objects.annotate(
-        total_calories=Sum('activities__calories_burned')
-    ).exclude(total_calories__isnull=True).order_by('-total_calories')[:10]
+    try:
+        limit = int(request.query_params.get('limit', leaderboard_store.DEFAULT_LIMIT))
+    except ValueError:
+        limit = leaderboard_store.DEFAULT_LIMIT
+    limit = max(1, min(limit, leaderboard_store.MAX_LIMIT))
     
+    return {'window': window, 'day': day, 'activity_type': activity_type, 'limit': limit}, None
+
+def leaderboard_payload(params, distance_leaders, calories_leaders):
+    """Build the leaderboard response body from the two top() results."""
+    window = params['window']
     distance_data = [
         {
-            'username': user.username,
-            'total_distance': float(user.total_distance or 0)
+            'username': username,
+            'total_distance': float(total_distance)
         }
-        for user in distance_leaders
+        for username, total_distance in distance_leaders
     ]
     
     calories_data = [
         {
-            'username': user.username,
-            'total_calories': user.total_calories or 0
+            'username': username,
+            'total_calories': total_calories
         }
-        for user in calories_leaders
+        for username, total_calories in calories_leaders
     ]
     
-    return Response({
+    return {
+        'window': window,
+        'period_start': leaderboard_store.period_start(window, params['day']) if window != 'all' else None,
+        'activity_type': params['activity_type'] or None,
         'distance_leaderboard': distance_data,
         'calories_leaderboard': calories_data
-    })
\ No newline at end of file
+    }
@@ -32,6 +32,7 @@ DJANGO_APPS = [
 THIRD_PARTY_APPS = [
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'django_filters',
 ]
@@ -47,6 +48,8 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
+    'users.middleware.MetricsMiddleware',
+    'users.middleware.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -56,6 +59,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'users.middleware.RateLimitHeadersMiddleware',
 ]
 
 ROOT_URLCONF = 'fitness_tracker_api.urls'
@@ -118,7 +122,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -132,6 +136,9 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'users.throttling.DeveloperRateThrottle',
+    ],
 }
 
 # Simple JWT
@@ -158,7 +165,9 @@ SIMPLE_JWT = {
     
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
-    'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
+    'TOKEN_USER_CLASS': 'users.authentication.ClaimsUser',
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefreshSerializer',
     
     'JTI_CLAIM': 'jti',
     
@@ -167,6 +176,95 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Stateless JWT authentication: request.user is built from the token claims
+# instead of the User row; account status and username are cached per process
+JWT_STATELESS_AUTH = config('JWT_STATELESS_AUTH', default=True, cast=bool)
+JWT_USER_CACHE_SIZE = config('JWT_USER_CACHE_SIZE', default=10000, cast=int)
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=30, cast=int)
+# Revoked token ids are read from the blacklist into memory this often (seconds)
+TOKEN_REVOCATION_SYNC_SECONDS = config('TOKEN_REVOCATION_SYNC_SECONDS', default=10, cast=int)
+
+# API key lookups cached per process (seconds; negative = unknown/inactive keys)
+API_KEY_CACHE_SIZE = config('API_KEY_CACHE_SIZE', default=1024, cast=int)
+API_KEY_CACHE_TTL = config('API_KEY_CACHE_TTL', default=60, cast=int)
+API_KEY_CACHE_NEGATIVE_TTL = config('API_KEY_CACHE_NEGATIVE_TTL', default=5, cast=int)
+
+# Developer rate limits (requests_per_hour / requests_per_day). The counters are
+# kept in a SQLite file shared by the worker processes on this host.
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMIT_STORE = config('RATE_LIMIT_STORE', default='')
+
+# Caches: local memory by default; set CACHE_LOCATION to a directory to use a
+# file cache shared by the worker processes
+CACHE_LOCATION = config('CACHE_LOCATION', default='')
+CACHES = {
+    'default': {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache' if CACHE_LOCATION
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': CACHE_LOCATION or 'fitness-tracker',
+    }
+}
+
+# Versioned per-user response cache (metrics, history pages, goal lists)
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Server-Timing header on every response; a sample of requests (0.0-1.0) is
+# logged as JSON, and requests slower than SERVER_TIMING_SLOW_MS always are,
+# with their SQL
+SERVER_TIMING_ENABLED = config('SERVER_TIMING_ENABLED', default=True, cast=bool)
+SERVER_TIMING_LOG_SAMPLE_RATE = config('SERVER_TIMING_LOG_SAMPLE_RATE', default=0.01, cast=float)
+SERVER_TIMING_SLOW_MS = config('SERVER_TIMING_SLOW_MS', default=1000, cast=int)
+
+# Prometheus metrics at /metrics, aggregated over the worker processes through
+# per-process files in METRICS_DIR (default: a per-project temp directory;
+# files of earlier runs are deleted on start). Scrapes must send
+# "Authorization: Bearer <METRICS_TOKEN>"; without a token /metrics is only
+# served with DEBUG on.
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'users.middleware': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Activity metrics source: 'rollups' (daily rollup table) or 'activities' (raw rows)
+ACTIVITY_METRICS_SOURCE = config('ACTIVITY_METRICS_SOURCE', default='rollups')
+
+# Bulk activity ingestion (POST /api/activities/bulk/)
+BULK_INGEST_CHUNK_SIZE = config('BULK_INGEST_CHUNK_SIZE', default=5000, cast=int)
+BULK_INGEST_MAX_CHUNK_SIZE = 10000
+BULK_INGEST_MAX_ROWS = config('BULK_INGEST_MAX_ROWS', default=100000, cast=int)
+BULK_INGEST_MAX_ERRORS = 1000
+
+# Streaming export (GET /api/activities/export/): rows fetched per database round trip
+ACTIVITY_EXPORT_CHUNK_SIZE = config('ACTIVITY_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Parallel /api/batch/ sub-requests (users.async_db): threads per process that
+# run them, each holding at most one connection
+ASYNC_DB_THREADS = config('ASYNC_DB_THREADS', default=8, cast=int)
+
+# Delta sync (GET /api/activities/sync/): deletions are kept this long, and
+# older sync tokens must start over with a full sync
+SYNC_TOMBSTONE_RETENTION_DAYS = config('SYNC_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+# Rows changed this recently are sent again on the next sync, to cover
+# writes that commit after a sync already read past their updated_at
+SYNC_SETTLE_SECONDS = config('SYNC_SETTLE_SECONDS', default=5, cast=int)
+
+# Batch requests (POST /api/batch/): sub-requests allowed per batch
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=20, cast=int)
+
 # CORS Settings 
 CORS_ALLOW_ALL_ORIGINS = True  
 
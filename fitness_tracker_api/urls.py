@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.http import HttpResponse
+from users.views import batch_requests, prometheus_metrics
 
 def home(request):
     html = """
@@ -131,6 +132,7 @@ def home(request):
 urlpatterns = [
     path('', home, name='home'),
     path('admin/', admin.site.urls),
+    path('metrics', prometheus_metrics, name='prometheus-metrics'),
     
     # User authentication (JWT)
     path('api/auth/', include('users.urls')),
@@ -142,4 +144,5 @@ urlpatterns = [
     
     # Main API endpoints
     path('api/activities/', include('activities.urls')),
+    path('api/batch/', batch_requests, name='batch'),
 ]
\ No newline at end of file
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth import get_user_model
 from django.utils.html import format_html
+from .api_key_cache import api_key_cache
 from .models import Developer
 
 User = get_user_model()
@@ -57,7 +58,13 @@ class DeveloperAdmin(admin.ModelAdmin):
     
     def deactivate_developers(self, request, queryset):
         """Deactivate selected developers"""
+        developers = list(queryset.values_list('pk', 'api_key'))
         count = queryset.update(is_active=False)
+        # update() skips the post_save handler that clears cached API keys
+        api_key_cache.invalidate(
+            developer_ids=[pk for pk, _ in developers],
+            keys=[api_key for _, api_key in developers]
+        )
         self.message_user(
             request, 
             f'{count} developer(s) were successfully deactivated.'
@@ -66,7 +73,13 @@ class DeveloperAdmin(admin.ModelAdmin):
     
     def activate_developers(self, request, queryset):
         """Activate selected developers"""
+        developers = list(queryset.values_list('pk', 'api_key'))
         count = queryset.update(is_active=True)
+        # update() skips the post_save handler that clears cached API keys
+        api_key_cache.invalidate(
+            developer_ids=[pk for pk, _ in developers],
+            keys=[api_key for _, api_key in developers]
+        )
         self.message_user(
             request, 
             f'{count} developer(s) were successfully activated.'
@@ -0,0 +1,108 @@
+"""
+In-process cache of API key lookups.
+
+APIKeyAuthentication would otherwise query the developers table on every
+request. Active developers are cached by API key in a bounded LRU with a TTL;
+unknown or inactive keys are cached separately for a shorter time so floods
+of bad keys neither reach the database nor evict the good entries.
+
+Entries are dropped when a developer is saved or deleted (see users.signals)
+and by the admin actions that change developers with QuerySet.update(). The
+cache is per process, so other workers notice a change when their entry
+expires; keep API_KEY_CACHE_TTL short.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import prometheus
+from .models import Developer
+
+
+class APIKeyCache:
+    def __init__(self, max_size=1024, ttl=60, negative_ttl=5):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            # key -> (expires_at, developer)
+            self.entries = OrderedDict()
+            # key -> expires_at, for keys that matched no active developer
+            self.missing = OrderedDict()
+            # developer pk -> cached key, so a regenerated key can be dropped
+            self.keys_by_developer = {}
+            # Bumped by every invalidation; a lookup that raced one is not stored
+            self.generation = getattr(self, 'generation', 0) + 1
+
+    def _store(self, table, key, value):
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > self.max_size:
+            _, old = table.popitem(last=False)
+            if table is self.entries:
+                self.keys_by_developer.pop(old[1].pk, None)
+
+    def get(self, key):
+        """
+        Return the active Developer for ``key`` or None, reading the database
+        only on a miss.
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                prometheus.CACHE_REQUESTS.inc('api_key', 'hit')
+                return entry[1]
+            expires_at = self.missing.get(key)
+            if expires_at is not None and expires_at > now:
+                self.hits += 1
+                prometheus.CACHE_REQUESTS.inc('api_key', 'hit')
+                return None
+            self.misses += 1
+            prometheus.CACHE_REQUESTS.inc('api_key', 'miss')
+            generation = self.generation
+
+        developer = Developer.objects.filter(api_key=key, is_active=True).first()
+
+        with self.lock:
+            if generation != self.generation:
+                return developer
+            if developer is None:
+                self.entries.pop(key, None)
+                self._store(self.missing, key, now + self.negative_ttl)
+            else:
+                self.missing.pop(key, None)
+                self._store(self.entries, key, (now + self.ttl, developer))
+                self.keys_by_developer[developer.pk] = key
+        return developer
+
+    def invalidate(self, developer_ids=(), keys=()):
+        """Drop the entries for the given developer pks and API keys."""
+        with self.lock:
+            self.generation += 1
+            for pk in developer_ids:
+                key = self.keys_by_developer.pop(pk, None)
+                if key is not None:
+                    self.entries.pop(key, None)
+            for key in keys:
+                entry = self.entries.pop(key, None)
+                if entry is not None:
+                    self.keys_by_developer.pop(entry[1].pk, None)
+                self.missing.pop(key, None)
+
+
+api_key_cache = APIKeyCache(
+    max_size=getattr(settings, 'API_KEY_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'API_KEY_CACHE_TTL', 60),
+    negative_ttl=getattr(settings, 'API_KEY_CACHE_NEGATIVE_TTL', 5),
+)
@@ -2,4 +2,11 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'users'
\ No newline at end of file
+    name = 'users'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import server_timing, signals  # noqa: F401
+
+        connection_created.connect(server_timing.install, dispatch_uid='users.server_timing')
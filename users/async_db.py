@@ -0,0 +1,53 @@
+"""
+Bounded thread pool for concurrent database work.
+
+Parallel /api/batch/ sub-requests (see users.batch) are handed to submit().
+The calls share one ThreadPoolExecutor per process with ASYNC_DB_THREADS
+threads. The pool bounds how many extra database connections they can hold,
+whatever the number of requests in flight; further calls queue until a
+thread is free. Independent calls run concurrently, each on its own thread
+and connection.
+
+Each call sees the caller's context variables (so its queries count towards
+the request's Server-Timing) and is treated like a request by the
+connection handling: connections that are broken or older than
+CONN_MAX_AGE are closed before and after it.
+"""
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_lock = threading.Lock()
+_executor = None
+_pid = None
+
+
+def executor():
+    """Return this process's pool, creating it on first use."""
+    global _executor, _pid
+    with _lock:
+        # Created lazily and per pid: the server may import us before forking
+        if _pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ASYNC_DB_THREADS', 8), thread_name_prefix='async-db',
+            )
+            _pid = os.getpid()
+        return _executor
+
+
+def _call(function, args, kwargs):
+    close_old_connections()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def submit(function, *args, **kwargs):
+    """Schedule ``function(*args, **kwargs)`` on the pool; returns a Future."""
+    context = contextvars.copy_context()
+    return executor().submit(context.run, _call, function, args, kwargs)
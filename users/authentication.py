@@ -1,6 +1,23 @@
 from rest_framework import authentication, exceptions
+from rest_framework_simplejwt import authentication as jwt_authentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
-from .models import Developer
+from django.utils.functional import cached_property
+from . import server_timing
+from .api_key_cache import api_key_cache
+from .revocation import check_version, revoked_tokens
+from .token_user_cache import token_user_cache
+
+
+class DeveloperUser(AnonymousUser):
+    """Anonymous user that counts as authenticated, for API key requests."""
+    # AnonymousUser.is_authenticated is a read-only property
+    is_authenticated = True
+
 
 class APIKeyAuthentication(authentication.BaseAuthentication):
     """
@@ -12,6 +29,7 @@ class APIKeyAuthentication(authentication.BaseAuthentication):
     """
     keyword = 'Api-Key'
     
+    @server_timing.timed('auth')
     def authenticate(self, request):
         auth = authentication.get_authorization_header(request).split()
         
@@ -34,15 +52,13 @@ class APIKeyAuthentication(authentication.BaseAuthentication):
         return self.authenticate_credentials(api_key)
     
     def authenticate_credentials(self, key):
-        try:
-            developer = Developer.objects.get(api_key=key, is_active=True)
-        except Developer.DoesNotExist:
+        developer = api_key_cache.get(key)
+        if developer is None:
             raise exceptions.AuthenticationFailed('Invalid API key.')
         
         # Create a fake user object for the developer
         # This allows us to use Django's permission system if needed
-        user = AnonymousUser()
-        user.is_authenticated = True
+        user = DeveloperUser()
         user.developer = developer  # Attach developer info to user
         
         return (user, developer)
@@ -59,6 +75,7 @@ class DeveloperAPIKeyAuthentication(authentication.BaseAuthentication):
     """
     keyword = 'Api-Key'
     
+    @server_timing.timed('auth')
     def authenticate(self, request):
         auth = authentication.get_authorization_header(request).split()
         
@@ -81,12 +98,91 @@ class DeveloperAPIKeyAuthentication(authentication.BaseAuthentication):
         return self.authenticate_credentials(api_key)
     
     def authenticate_credentials(self, key):
-        try:
-            developer = Developer.objects.get(api_key=key, is_active=True)
-        except Developer.DoesNotExist:
+        developer = api_key_cache.get(key)
+        if developer is None:
             raise exceptions.AuthenticationFailed('Invalid API key.')
         
         return (developer, key)
     
     def authenticate_header(self, request):
-        return self.keyword
\ No newline at end of file
+        return self.keyword
+
+
+class ClaimsUser(TokenUser):
+    """
+    request.user of stateless JWT authentication: the id comes from the
+    token, the username from users.token_user_cache. Views that need the
+    User model itself get it from user_instance().
+    """
+
+    def __init__(self, token, username=''):
+        super().__init__(token)
+        self.username = username
+
+    @cached_property
+    def instance(self):
+        return get_user_model().objects.get(pk=self.id)
+
+    def __getattr__(self, attr):
+        # TokenUser answers None for any unknown attribute (custom claims),
+        # which would make hasattr(request.user, 'developer') true
+        raise AttributeError(attr)
+
+
+def user_instance(user):
+    """The User model instance behind ``user``, loaded on first use for a ClaimsUser."""
+    return user.instance if isinstance(user, ClaimsUser) else user
+
+
+class JWTAuthentication(jwt_authentication.JWTAuthentication):
+    """
+    simplejwt's JWTAuthentication, timed for the Server-Timing header.
+    With JWT_STATELESS_AUTH the User row is not loaded: request.user is a
+    TOKEN_USER_CLASS (ClaimsUser) built from the token, and the account is
+    checked against users.token_user_cache. Revoked tokens are refused
+    (see users.revocation).
+    """
+
+    @server_timing.timed('auth')
+    def authenticate(self, request):
+        return super().authenticate(request)
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if revoked_tokens.is_revoked(validated_token[api_settings.JTI_CLAIM]):
+            raise InvalidToken('Token is blacklisted')
+        return validated_token
+
+    def get_user(self, validated_token):
+        if not getattr(settings, 'JWT_STATELESS_AUTH', True):
+            user = super().get_user(validated_token)
+            self.check_version(validated_token, user.token_version)
+            return user
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        state = token_user_cache.get(user_id)
+        if state is None:
+            raise exceptions.AuthenticationFailed('User not found', code='user_not_found')
+        is_active, username, token_version = state
+        if not is_active:
+            raise exceptions.AuthenticationFailed('User is inactive', code='user_inactive')
+        self.check_version(validated_token, token_version)
+        return api_settings.TOKEN_USER_CLASS(validated_token, username)
+
+    def check_version(self, validated_token, token_version):
+        try:
+            check_version(validated_token, token_version)
+        except TokenError as exc:
+            raise InvalidToken(str(exc))
+
+
+class SessionAuthentication(authentication.SessionAuthentication):
+    """DRF's SessionAuthentication, timed for the Server-Timing header."""
+
+    @server_timing.timed('auth')
+    def authenticate(self, request):
+        return super().authenticate(request)
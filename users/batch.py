@@ -0,0 +1,179 @@
+"""
+Batch requests: several API calls in one HTTP round trip.
+
+POST /api/batch/ carries a list of sub-requests against the routes of
+activities.urls and users.urls. The batch is authenticated once; every
+sub-request reuses its user through DRF's forced authentication (as
+APIClient.force_authenticate does) and goes straight to its view, without
+the middleware. Views still run their permission checks and throttles, so
+an API key spends one request of its rate limit per sub-request.
+
+Sub-requests run in order and are not atomic: each write commits on its
+own. With ``parallel``, every run of consecutive GET sub-requests runs
+concurrently on the users.async_db pool, each on its own database
+connection; a GET still sees the writes listed before it.
+"""
+import functools
+import json
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.handlers.exception import response_for_exception
+from django.core.handlers.wsgi import WSGIRequest
+from django.urls import Resolver404, resolve
+
+from . import async_db
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+# Request-specific META keys of the batch request that sub-requests replace
+_OWN_META = ('REQUEST_METHOD', 'PATH_INFO', 'QUERY_STRING', 'CONTENT_TYPE', 'CONTENT_LENGTH')
+
+
+class InvalidBatch(Exception):
+    pass
+
+
+@functools.cache
+def _views():
+    """View callbacks that sub-requests may reach."""
+    # Imported here: users.urls imports users.views, which imports us
+    import activities.urls
+    import users.urls
+
+    return {
+        pattern.callback
+        for urlpatterns in (activities.urls.urlpatterns, users.urls.urlpatterns)
+        for pattern in urlpatterns
+    }
+
+
+def parse(payload, max_requests):
+    """
+    Validate the batch body and return its sub-requests as dicts with
+    ``method``, ``url``, ``body`` and ``headers``. Raises InvalidBatch.
+    """
+    requests = payload.get('requests') if isinstance(payload, dict) else None
+    if not isinstance(requests, list) or not requests:
+        raise InvalidBatch('requests must be a non-empty list.')
+    if len(requests) > max_requests:
+        raise InvalidBatch(f'A batch holds at most {max_requests} requests.')
+
+    specs = []
+    for index, item in enumerate(requests):
+        if not isinstance(item, dict):
+            raise InvalidBatch(f'requests[{index}] must be an object.')
+        method = str(item.get('method', 'GET')).upper()
+        if method not in METHODS:
+            raise InvalidBatch(f'requests[{index}].method must be one of: {", ".join(METHODS)}')
+        url = item.get('url')
+        if not isinstance(url, str) or not url.startswith('/'):
+            raise InvalidBatch(f'requests[{index}].url must be a path starting with /.')
+        headers = item.get('headers', {})
+        if not isinstance(headers, dict) or not all(
+            isinstance(name, str) and isinstance(value, str) for name, value in headers.items()
+        ):
+            raise InvalidBatch(f'requests[{index}].headers must map header names to strings.')
+        specs.append({'method': method, 'url': url, 'body': item.get('body'), 'headers': headers})
+    return specs
+
+
+def _sub_request(request, spec):
+    """Build the HttpRequest of one sub-request of ``request``."""
+    environ = {
+        key: value for key, value in request.META.items()
+        if key not in _OWN_META and (not key.startswith('HTTP_') or key == 'HTTP_HOST')
+    }
+    url = urlsplit(spec['url'])
+    body = b'' if spec['body'] is None else json.dumps(spec['body']).encode()
+    environ.update({
+        'REQUEST_METHOD': spec['method'],
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': BytesIO(body),
+        'wsgi.url_scheme': request.scheme,
+    })
+    for name, value in spec['headers'].items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+    sub_request = WSGIRequest(environ)
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = getattr(request, 'auth', None)
+    return sub_request
+
+
+def _error(status_code, message):
+    return {'status': status_code, 'headers': {}, 'body': json.dumps({'error': message}).encode()}
+
+
+def dispatch(request, spec):
+    """
+    Run one sub-request of the DRF ``request``; returns a dict with its
+    ``status``, ``headers``, ``body`` (JSON bytes) and the
+    ``rate_limit_headers`` its throttle computed, if any.
+    """
+    sub_request = _sub_request(request._request, spec)
+    try:
+        match = resolve(sub_request.path_info)
+    except Resolver404:
+        return _error(404, 'Not found.')
+    if match.func not in _views():
+        return _error(400, f'{sub_request.path_info} cannot be batched.')
+
+    sub_request.resolver_match = match
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+    except Exception as exc:
+        response = response_for_exception(sub_request, exc)
+
+    if response.streaming:
+        response.close()
+        return _error(400, f'{sub_request.path_info} streams its response and cannot be batched.')
+
+    content = response.content
+    if not content:
+        body = b'null'
+    elif response.get('Content-Type', '').startswith('application/json'):
+        # Spliced into the batch response as is, not parsed and encoded again
+        body = content
+    else:
+        body = json.dumps(content.decode(response.charset, 'replace')).encode()
+    return {
+        'status': response.status_code,
+        'headers': {name: value for name, value in response.items() if name != 'Content-Length'},
+        'body': body,
+        'rate_limit_headers': getattr(sub_request, 'rate_limit_headers', None),
+    }
+
+
+def run(request, specs, parallel=False):
+    """Dispatch ``specs`` in order; returns one dispatch() result per spec."""
+    results = []
+    index = 0
+    while index < len(specs):
+        end = index + 1
+        if parallel and specs[index]['method'] == 'GET':
+            while end < len(specs) and specs[end]['method'] == 'GET':
+                end += 1
+        if end - index == 1:
+            results.append(dispatch(request, specs[index]))
+        else:
+            futures = [async_db.submit(dispatch, request, spec) for spec in specs[index:end]]
+            results.extend(future.result() for future in futures)
+        index = end
+    return results
+
+
+def render(results):
+    """The batch response body: {"responses": [...]} in request order."""
+    items = [
+        b'{"status": %d, "headers": %s, "body": %s}' % (
+            result['status'], json.dumps(result['headers']).encode(), result['body']
+        )
+        for result in results
+    ]
+    return b'{"responses": [' + b', '.join(items) + b']}'
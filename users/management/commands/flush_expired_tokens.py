@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from users import revocation
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired tokens from the token blacklist tables; they can no longer '
+        'be used, revoked or not'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of tokens deleted per DELETE',
+        )
+
+    def handle(self, *args, **options):
+        deleted = revocation.flush_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired token(s)'))
@@ -0,0 +1,245 @@
+import random
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from decimal import Decimal
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from activities import leaderboard, progress, rollups
+from activities.models import Activity, Goal
+
+User = get_user_model()
+
+# activity_type: (share of all activities, mean minutes, minutes spread,
+#                 km/h or None when there is no distance, kcal per minute)
+ACTIVITY_PROFILES = {
+    'running': (0.20, 40, 15, 10.0, 11.0),
+    'walking': (0.18, 45, 20, 5.0, 4.5),
+    'cycling': (0.14, 60, 25, 20.0, 8.0),
+    'weightlifting': (0.10, 50, 15, None, 6.0),
+    'yoga': (0.08, 45, 15, None, 3.5),
+    'swimming': (0.06, 40, 15, 2.5, 9.0),
+    'hiking': (0.05, 120, 50, 4.0, 7.0),
+    'basketball': (0.04, 60, 20, None, 8.5),
+    'football': (0.04, 80, 20, None, 9.0),
+    'tennis': (0.03, 60, 20, None, 8.0),
+    'dancing': (0.03, 50, 20, None, 6.5),
+    'boxing': (0.03, 45, 15, None, 10.0),
+    'other': (0.02, 30, 15, None, 5.0),
+}
+
+# Goal targets per day of the goal's period
+GOAL_DAILY_TARGETS = {
+    'distance': (3, 12),
+    'duration': (20, 90),
+    'calories': (200, 800),
+    'frequency': (0.5, 1.2),
+}
+
+PERIOD_DAYS = {'daily': 1, 'weekly': 7, 'monthly': 30, 'yearly': 365}
+
+
+def _init_worker():
+    # Each worker process opens its own database connections
+    django.setup()
+    connections.close_all()
+
+
+def _activity(rng, user_id, activity_type, today, days):
+    _, mean, spread, speed, kcal_per_minute = ACTIVITY_PROFILES[activity_type]
+    duration = max(5, int(rng.gauss(mean, spread)))
+    distance = None
+    if speed is not None:
+        km = speed * rng.uniform(0.8, 1.2) * duration / 60
+        distance = min(Decimal(round(km, 2)).quantize(Decimal('0.01')), Decimal('9999.99'))
+        distance = max(distance, Decimal('0.01'))
+    return Activity(
+        user_id=user_id,
+        activity_type=activity_type,
+        duration=duration,
+        distance=distance,
+        calories_burned=max(1, int(duration * kcal_per_minute * rng.uniform(0.85, 1.15))),
+        date=today - timedelta(days=int(rng.triangular(0, days, 0))),
+        notes='' if rng.random() < 0.7 else rng.choice(
+            ['Felt great', 'Tough session', 'Easy pace', 'New personal best', 'Recovery day']
+        ),
+    )
+
+
+def _goal(rng, user_id, period, today):
+    goal_type = rng.choice([choice for choice, _ in Goal.GOAL_TYPES])
+    low, high = GOAL_DAILY_TARGETS[goal_type]
+    days = PERIOD_DAYS[period]
+    start = today - timedelta(days=rng.randint(0, days - 1)) if days > 1 else today
+    return Goal(
+        user_id=user_id,
+        goal_type=goal_type,
+        target_value=Decimal(max(1, round(rng.uniform(low, high) * days))),
+        period=period,
+        activity_type=rng.choice(['', '', 'running', 'cycling', 'walking', 'swimming']),
+        start_date=start,
+        end_date=start + timedelta(days=days),
+        is_active=rng.random() < 0.9,
+    )
+
+
+def seed_chunk(first_index, count, options, password_hash):
+    """
+    Create ``count`` users starting at ``first_index`` with their activities
+    and goals; runs in a worker process or inline.
+    """
+    rng = random.Random(f"{options['seed']}-{first_index}")
+    batch_size = options['batch_size']
+    prefix = options['prefix']
+    today = date.today()
+    types = list(ACTIVITY_PROFILES)
+    weights = [profile[0] for profile in ACTIVITY_PROFILES.values()]
+    periods = [choice for choice, _ in Goal.PERIOD_CHOICES]
+
+    # One transaction per INSERT batch rather than per chunk, so concurrent
+    # workers on a single-writer database (SQLite) only wait briefly
+    users = User.objects.bulk_create(
+        [
+            User(
+                username=f'{prefix}{index}',
+                email=f'{prefix}{index}@example.com',
+                password=password_hash,
+            )
+            for index in range(first_index, first_index + count)
+        ],
+        batch_size=batch_size,
+    )
+    user_ids = [user.pk for user in users]
+    if None in user_ids:
+        # Backends without RETURNING leave pks unset
+        user_ids = list(
+            User.objects.filter(username__in=[user.username for user in users])
+            .values_list('pk', flat=True)
+        )
+
+    activities = 0
+    batch = []
+    for user_id in user_ids:
+        # Most people stick to two or three favourite activities
+        favourites = rng.choices(types, weights=weights, k=3)
+        per_user = max(0, int(rng.gauss(options['activities_per_user'], options['activities_per_user'] * 0.2)))
+        for _ in range(per_user):
+            activity_type = rng.choice(favourites) if rng.random() < 0.8 else rng.choices(types, weights)[0]
+            batch.append(_activity(rng, user_id, activity_type, today, options['days']))
+            if len(batch) >= batch_size:
+                Activity.objects.bulk_create(batch)
+                activities += len(batch)
+                batch = []
+    if batch:
+        Activity.objects.bulk_create(batch)
+        activities += len(batch)
+
+    goals = [
+        _goal(rng, user_id, periods[i % len(periods)], today)
+        for user_id in user_ids
+        for i in range(options['goals_per_user'])
+    ]
+    Goal.objects.bulk_create(goals, batch_size=batch_size)
+
+    # bulk_create skips the signal handlers that maintain derived data
+    if not options['skip_derived']:
+        rollups.rebuild(user_ids=user_ids, batch_size=batch_size)
+        leaderboard.rebuild(user_ids=user_ids, batch_size=batch_size)
+        progress.rebuild(user_ids=user_ids)
+
+    return len(user_ids), activities, len(goals)
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, activities and goals at scale for local capacity planning'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Users to create')
+        parser.add_argument(
+            '--activities-per-user', type=int, default=200,
+            help='Average activities per user (varies +-20%% per user)',
+        )
+        parser.add_argument(
+            '--goals-per-user', type=int, default=len(Goal.PERIOD_CHOICES),
+            help='Goals per user, cycling through every period',
+        )
+        parser.add_argument('--days', type=int, default=365, help='Days of history to spread activities over')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk INSERT')
+        parser.add_argument('--users-per-chunk', type=int, default=100, help='Users per unit of work')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes')
+        parser.add_argument('--prefix', default='seed_user_', help='Username/email prefix')
+        parser.add_argument('--password', default='seed-pass-123', help='Password for every seeded user')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help="Don't build rollups, leaderboard or goal progress (run rebuild_rollups afterwards)",
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--users, --batch-size and --workers must be positive.')
+
+        first_index = self.next_index(options['prefix'])
+        # Hashing is deliberately slow, so every seeded user shares one hash
+        password_hash = make_password(options['password'])
+        chunks = [
+            (start, min(options['users_per_chunk'], first_index + options['users'] - start))
+            for start in range(first_index, first_index + options['users'], options['users_per_chunk'])
+        ]
+
+        self.stdout.write(
+            f"Seeding {options['users']} users (~{options['activities_per_user']} activities each) "
+            f"in {len(chunks)} chunk(s) with {options['workers']} worker(s)..."
+        )
+        began = time.perf_counter()
+        totals = [0, 0, 0]
+
+        if options['workers'] == 1:
+            results = (seed_chunk(start, count, options, password_hash) for start, count in chunks)
+            self.report(results, totals, began)
+        else:
+            # Forked workers must not share the parent's connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                futures = [
+                    pool.submit(seed_chunk, start, count, options, password_hash)
+                    for start, count in chunks
+                ]
+                self.report((future.result() for future in as_completed(futures)), totals, began)
+
+        elapsed = time.perf_counter() - began
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {totals[0]} users, {totals[1]} activities and {totals[2]} goals '
+            f'in {elapsed:.1f}s ({totals[1] / max(elapsed, 1e-9):.0f} activities/s)'
+        ))
+        if options['skip_derived']:
+            self.stdout.write('Derived data was skipped; run "python manage.py rebuild_rollups".')
+
+    def next_index(self, prefix):
+        """First free numeric suffix for ``prefix`` so reruns add more users."""
+        pattern = re.compile(rf'^{re.escape(prefix)}(\d+)$')
+        indexes = [
+            int(match.group(1))
+            for match in map(pattern.match, User.objects.filter(
+                username__startswith=prefix
+            ).values_list('username', flat=True).iterator())
+            if match
+        ]
+        return max(indexes, default=-1) + 1
+
+    def report(self, results, totals, began):
+        for users, activities, goals in results:
+            totals[0] += users
+            totals[1] += activities
+            totals[2] += goals
+            elapsed = time.perf_counter() - began
+            self.stdout.write(
+                f'  {totals[0]} users, {totals[1]} activities '
+                f'({totals[1] / max(elapsed, 1e-9):.0f} activities/s)'
+            )
@@ -0,0 +1,185 @@
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import prometheus, server_timing
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """
+    Report per-request database and phase timings without DEBUG.
+
+    Queries are counted and timed by server_timing.record() (in every
+    thread that works for the request, so async views are covered too),
+    authentication time is added by the authentication classes, and the
+    view and render phases are taken from the process_view and
+    process_template_response hooks. The totals go out as a Server-Timing
+    header. A sample of requests (SERVER_TIMING_LOG_SAMPLE_RATE) is logged
+    as one JSON line. Requests slower than SERVER_TIMING_SLOW_MS are always
+    logged, together with their SQL. Under ASGI, ``db`` adds up queries
+    that ran concurrently and may exceed ``view``.
+
+    Keep it near the top of MIDDLEWARE so ``total`` covers the other
+    middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', True):
+            return self.get_response(request)
+
+        response, timer = server_timing.measure(request, self.get_response)
+        return self.finish(request, response, timer)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', True):
+            return await self.get_response(request)
+
+        response, timer = await server_timing.ameasure(request, self.get_response)
+        return self.finish(request, response, timer)
+
+    def finish(self, request, response, timer):
+        finished = time.perf_counter()
+
+        total = finished - timer.started
+        auth = timer.phases.pop('auth', 0.0)
+        view = render = None
+        if timer.view_started is not None:
+            view_finished = timer.view_finished or finished
+            view = max(view_finished - timer.view_started - auth, 0.0)
+            if timer.view_finished is not None:
+                render = finished - timer.view_finished
+
+        metrics = [('db', timer.sql_time, f'{timer.queries} queries'), ('auth', auth, None)]
+        metrics += [('view', view, None), ('render', render, None)]
+        metrics += [(phase, seconds, None) for phase, seconds in timer.phases.items()]
+        metrics.append(('total', total, None))
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.1f}' + (f';desc="{desc}"' if desc else '')
+            for name, seconds, desc in metrics
+            if seconds is not None
+        )
+
+        slow = total * 1000 >= getattr(settings, 'SERVER_TIMING_SLOW_MS', 1000)
+        if slow or random.random() < getattr(settings, 'SERVER_TIMING_LOG_SAMPLE_RATE', 0.0):
+            self.log(request, response, timer, metrics, slow)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'server_timing'):
+            request.server_timing.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called after the view returns and right before the response is
+        # rendered (DRF responses are template responses)
+        if hasattr(request, 'server_timing'):
+            request.server_timing.view_finished = time.perf_counter()
+        return response
+
+    def log(self, request, response, timer, metrics, slow):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': timer.queries,
+        }
+        record.update(
+            (f'{name}_ms', round(seconds * 1000, 2)) for name, seconds, _ in metrics if seconds is not None
+        )
+        if slow:
+            record['sql'] = [
+                {'sql': sql, 'ms': round(seconds * 1000, 2)} for sql, seconds in timer.statements
+            ]
+            logger.warning('slow request %s', json.dumps(record))
+        else:
+            logger.info('request %s', json.dumps(record))
+
+
+class MetricsMiddleware:
+    """
+    Record request counts, latency, SQL query count/time and 401s per URL
+    name (e.g. ``activity-metrics``) in the Prometheus registry. Shares the
+    request timer with ServerTimingMiddleware; keep it first in MIDDLEWARE.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        response, timer = server_timing.measure(request, self.get_response)
+        return self.record(request, response, timer)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return await self.get_response(request)
+
+        response, timer = await server_timing.ameasure(request, self.get_response)
+        return self.record(request, response, timer)
+
+    def record(self, request, response, timer):
+        duration = time.perf_counter() - timer.started
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        if view == 'prometheus-metrics':
+            return response
+        prometheus.REQUESTS.inc(view, request.method, str(response.status_code))
+        prometheus.REQUEST_DURATION.observe(duration, view, request.method)
+        prometheus.DB_QUERIES.observe(timer.queries, view)
+        prometheus.DB_DURATION.observe(timer.sql_time, view)
+        if response.status_code == 401:
+            prometheus.AUTH_FAILURES.inc(view)
+        return response
+
+
+class RateLimitHeadersMiddleware:
+    """
+    Copy the X-RateLimit-* headers computed by DeveloperRateThrottle onto
+    the response (throttles run inside the view and never see the response).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.add_headers(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.add_headers(request, await self.get_response(request))
+
+    def add_headers(self, request, response):
+        for header, value in getattr(request, 'rate_limit_headers', {}).items():
+            response[header] = value
+        return response
@@ -9,6 +9,8 @@ class User(AbstractUser):
     last_name = models.CharField(max_length=30, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Stamped into issued JWTs; bumping it revokes every token issued before
+    token_version = models.PositiveIntegerField(default=0)
     
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['email']
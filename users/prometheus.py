@@ -0,0 +1,295 @@
+"""
+Prometheus metrics shared by the worker processes on a host.
+
+Every process writes its samples to its own memory-mapped file in
+METRICS_DIR, and it is the only writer of that file. An increment is an
+in-place update of a float in the mapped memory, with no cross-process
+lock and no system call (a process-local mutex only protects threaded
+workers). The /metrics view reads every file in the directory and adds
+the values up, so any worker can answer a scrape for all of them. Files
+of exited workers are kept so their counters stay monotonic.
+
+Files are named after the worker and its parent (the gunicorn master), and
+the first worker of a new master deletes the files of masters that are no
+longer running: counters start from zero on every start of the service,
+and never include an earlier deploy. METRICS_DIR defaults to a directory
+per project checkout, so other services on the host never mix in.
+"""
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+# Each entry: uint32 key length, the JSON key padded to 8 bytes, float64 value.
+# The first 8 bytes of the file hold the number of bytes in use.
+_HEADER = struct.Struct('<Q')
+_KEY_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+_INITIAL_SIZE = 64 * 1024
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _padded(length):
+    return length + (-length % 8)
+
+
+def _read_entries(data):
+    """Yield (key, value) pairs from the contents of a samples file."""
+    if len(data) < _HEADER.size:
+        return
+    used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+    position = _HEADER.size
+    while position + _KEY_LENGTH.size <= used:
+        length = _KEY_LENGTH.unpack_from(data, position)[0]
+        key_end = position + _KEY_LENGTH.size + length
+        value_at = position + _padded(_KEY_LENGTH.size + length)
+        if value_at + _VALUE.size > used:
+            break
+        yield data[position + _KEY_LENGTH.size:key_end].decode(), _VALUE.unpack_from(data, value_at)[0]
+        position = value_at + _VALUE.size
+
+
+class SampleFile:
+    """Float values by key in a memory-mapped file written by one process."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < _INITIAL_SIZE:
+            self.file.truncate(_INITIAL_SIZE)
+            size = _INITIAL_SIZE
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.used = max(_HEADER.unpack_from(self.map, 0)[0], _HEADER.size)
+        # A reused pid finds the file of an earlier process; keep counting on it
+        self.positions = {}
+        position = _HEADER.size
+        for key, _ in _read_entries(self.map):
+            position += _padded(_KEY_LENGTH.size + len(key.encode()))
+            self.positions[key] = position
+            position += _VALUE.size
+
+    def add(self, key, amount):
+        position = self.positions.get(key)
+        if position is None:
+            position = self._append(key)
+        _VALUE.pack_into(self.map, position, _VALUE.unpack_from(self.map, position)[0] + amount)
+
+    def _append(self, key):
+        encoded = key.encode()
+        value_at = self.used + _padded(_KEY_LENGTH.size + len(encoded))
+        end = value_at + _VALUE.size
+        if end > len(self.map):
+            size = len(self.map)
+            while size < end:
+                size *= 2
+            self.map.close()
+            self.file.truncate(size)
+            self.map = mmap.mmap(self.file.fileno(), size)
+        _KEY_LENGTH.pack_into(self.map, self.used, len(encoded))
+        self.map[self.used + _KEY_LENGTH.size:self.used + _KEY_LENGTH.size + len(encoded)] = encoded
+        _VALUE.pack_into(self.map, value_at, 0.0)
+        # Publish the entry only once it is complete
+        _HEADER.pack_into(self.map, 0, end)
+        self.used = end
+        self.positions[key] = value_at
+        return value_at
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _sample_owner(filename):
+    """(parent pid, pid) from a samples file name, or None if it is not one."""
+    parts = filename.removesuffix('.db').split('_')
+    if len(parts) != 3 or parts[0] != 'samples' or not filename.endswith('.db'):
+        return None
+    try:
+        return int(parts[1]), int(parts[2])
+    except ValueError:
+        return None
+
+
+class Registry:
+    """The metrics of this service and the per-process sample file."""
+
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+        self.pid = None
+        self.samples = None
+        # (sample name, label values) -> JSON key, so keys are built once
+        self.keys = {}
+
+    def directory(self):
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if directory:
+            return directory
+        project = hashlib.sha1(str(settings.BASE_DIR).encode()).hexdigest()[:12]
+        return os.path.join(tempfile.gettempdir(), f'fitness_tracker_metrics_{project}')
+
+    def clear_stale(self, directory):
+        """Delete the files left by earlier runs (masters no longer running)."""
+        parent = os.getppid()
+        for filename in os.listdir(directory):
+            owner = _sample_owner(filename)
+            if owner is None or owner[0] == parent or _is_running(owner[0]):
+                continue
+            try:
+                os.remove(os.path.join(directory, filename))
+            except OSError:
+                pass
+
+    def add(self, name, labels, amount):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return
+        with self.lock:
+            # Opened lazily and per pid: gunicorn may import us before forking
+            if self.pid != os.getpid():
+                directory = self.directory()
+                os.makedirs(directory, exist_ok=True)
+                self.clear_stale(directory)
+                self.samples = SampleFile(
+                    os.path.join(directory, f'samples_{os.getppid()}_{os.getpid()}.db')
+                )
+                self.pid = os.getpid()
+            cache_key = (name, labels)
+            key = self.keys.get(cache_key)
+            if key is None:
+                key = self.keys[cache_key] = json.dumps([name, labels])
+            self.samples.add(key, amount)
+
+    def collect(self):
+        """Return ``{(sample name, label values): value}`` summed over all processes."""
+        totals = defaultdict(float)
+        directory = self.directory()
+        if not os.path.isdir(directory):
+            return totals
+        for filename in os.listdir(directory):
+            if _sample_owner(filename) is None:
+                continue
+            try:
+                with open(os.path.join(directory, filename), 'rb') as handle:
+                    data = handle.read()
+            except OSError:
+                continue
+            for key, value in _read_entries(data):
+                name, labels = json.loads(key)
+                totals[name, tuple(labels)] += value
+        return totals
+
+    def exposition(self):
+        """Render every registered metric in the Prometheus text format."""
+        totals = self.collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render(totals))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _sample(name, labelnames, labels, value):
+    if labelnames:
+        rendered = ','.join(f'{label}="{_escape(value)}"' for label, value in zip(labelnames, labels))
+        name = f'{name}{{{rendered}}}'
+    return f'{name} {float(value)!r}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.metrics.append(self)
+
+    def inc(self, *labels, amount=1):
+        registry.add(self.name, labels, amount)
+
+    def render(self, totals):
+        for (name, labels), value in sorted(totals.items()):
+            if name == self.name:
+                yield _sample(self.name, self.labelnames, labels, value)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+        registry.metrics.append(self)
+
+    def observe(self, value, *labels):
+        # Only the matching bucket is stored; buckets are made cumulative on render
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        registry.add(f'{self.name}_bucket', labels + (index,), 1)
+        registry.add(f'{self.name}_sum', labels, value)
+
+    def render(self, totals):
+        series = defaultdict(lambda: [0.0] * len(self.buckets))
+        sums = {}
+        for (name, labels), value in totals.items():
+            if name == f'{self.name}_bucket':
+                *labels, index = labels
+                if index < len(self.buckets):
+                    series[tuple(labels)][index] += value
+            elif name == f'{self.name}_sum':
+                sums[labels] = value
+        for labels in sorted(series):
+            count = 0.0
+            for bound, value in zip(self.buckets, series[labels]):
+                count += value
+                le = '+Inf' if math.isinf(bound) else f'{bound:g}'
+                yield _sample(f'{self.name}_bucket', self.labelnames + ('le',), labels + (le,), count)
+            yield _sample(f'{self.name}_sum', self.labelnames, labels, sums.get(labels, 0.0))
+            yield _sample(f'{self.name}_count', self.labelnames, labels, count)
+
+
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by URL name, method and status.', ('view', 'method', 'status')
+)
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time to produce the response, by URL name.', ('view', 'method')
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL queries per request, by URL name.', ('view',),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100, 500),
+)
+DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in SQL per request, by URL name.', ('view',)
+)
+AUTH_FAILURES = Counter(
+    'http_auth_failures_total', 'Requests rejected with 401 Unauthorized, by URL name.', ('view',)
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit or miss).', ('cache', 'result')
+)
@@ -0,0 +1,141 @@
+"""
+JWT revocation.
+
+Single tokens (refresh tokens after rotation or logout, and the access token
+presented at logout) are revoked in simplejwt's token_blacklist tables.
+Looking them up on every request would cost a query, so each process keeps
+the JTIs of the revoked, unexpired tokens in memory (revoked_tokens) and
+syncs them from the blacklist every TOKEN_REVOCATION_SYNC_SECONDS: a token
+that is not revoked, the common case, is accepted without a query. Tokens
+revoked by this process are refused at once, those revoked by other
+processes after the next sync.
+
+All the tokens of a user are revoked at once by bumping User.token_version,
+which every token issued to them carries in the token_version claim; the
+current version comes with the account state from users.token_user_cache.
+
+Expired tokens are removed from the blacklist by the flush_expired_tokens
+command, and from memory at each sync.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+TOKEN_VERSION_CLAIM = 'token_version'
+
+
+class RevokedTokens:
+    """JTIs of the revoked, unexpired tokens, synced from the blacklist."""
+
+    def __init__(self, interval=10, overlap=5):
+        self.interval = interval
+        # Blacklist rows are stamped before they commit, so every sync also
+        # re-reads the rows stamped shortly before the previous one
+        self.overlap = timedelta(seconds=overlap)
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            # jti -> expires_at
+            self.expiry = {}
+            self.synced_at = None
+            self.next_sync = 0.0
+
+    def is_revoked(self, jti):
+        if time.monotonic() >= self.next_sync:
+            self.sync()
+        return jti in self.expiry
+
+    def add(self, jti, expires_at):
+        with self.lock:
+            self.expiry[jti] = expires_at
+
+    def sync(self):
+        # One thread syncs; the others keep using the current set meanwhile
+        if not self.sync_lock.acquire(blocking=False):
+            return
+        try:
+            started = timezone.now()
+            rows = BlacklistedToken.objects.filter(token__expires_at__gt=started)
+            if self.synced_at is not None:
+                rows = rows.filter(blacklisted_at__gte=self.synced_at - self.overlap)
+            fetched = list(rows.values_list('token__jti', 'token__expires_at'))
+
+            with self.lock:
+                self.expiry.update(fetched)
+                self.expiry = {
+                    jti: expires_at for jti, expires_at in self.expiry.items() if expires_at > started
+                }
+                self.synced_at = started
+                self.next_sync = time.monotonic() + self.interval
+        finally:
+            self.sync_lock.release()
+
+
+revoked_tokens = RevokedTokens(interval=getattr(settings, 'TOKEN_REVOCATION_SYNC_SECONDS', 10))
+
+
+def revoke(token, user_id=None):
+    """Blacklist ``token`` (a refresh or access token); returns (BlacklistedToken, created)."""
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = datetime_from_epoch(token['exp'])
+    outstanding, _ = OutstandingToken.objects.get_or_create(
+        jti=jti,
+        defaults={'user_id': user_id, 'token': str(token), 'expires_at': expires_at},
+    )
+    blacklisted = BlacklistedToken.objects.get_or_create(token=outstanding)
+    revoked_tokens.add(jti, expires_at)
+    return blacklisted
+
+
+def flush_expired(batch_size=1000):
+    """Delete expired tokens and their blacklist entries; returns how many tokens."""
+    now = timezone.now()
+    deleted = 0
+    while True:
+        pks = list(
+            OutstandingToken.objects.filter(expires_at__lte=now).order_by('expires_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted
+        # Cascades to BlacklistedToken
+        OutstandingToken.objects.filter(pk__in=pks).delete()
+        deleted += len(pks)
+
+
+def check_version(token, token_version):
+    """Raise TokenError if ``token`` was issued before the user's current token_version."""
+    if token.get(TOKEN_VERSION_CLAIM, 0) < token_version:
+        raise TokenError('Token has been revoked')
+
+
+class RefreshToken(tokens.RefreshToken):
+    """
+    simplejwt's RefreshToken, stamped with the user's token_version and
+    checked against revoked_tokens instead of querying the blacklist.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        # Copied into the access tokens made from this one
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+    def check_blacklist(self):
+        if revoked_tokens.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError('Token is blacklisted')
+
+    def blacklist(self):
+        return revoke(self, self.payload.get(api_settings.USER_ID_CLAIM))
@@ -1,7 +1,12 @@
 from rest_framework import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from .models import Developer
+from .revocation import RefreshToken, check_version
+from .token_user_cache import token_user_cache
 
 User = get_user_model()
 
@@ -46,6 +51,28 @@ class PasswordChangeSerializer(serializers.Serializer):
             raise serializers.ValidationError("New passwords don't match")
         return attrs
 
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    """Login; issues tokens carrying the user's token_version."""
+    token_class = RefreshToken
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """
+    Refresh (and rotate) a refresh token, refusing revoked tokens and
+    tokens of inactive or deleted users.
+    """
+    token_class = RefreshToken
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        state = token_user_cache.get(refresh.get(api_settings.USER_ID_CLAIM))
+        if state is None or not state[0]:
+            raise TokenError('User not found or inactive')
+        check_version(refresh, state[2])
+        return super().validate(attrs)
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=True)
+
 # Developer API serializers
 class DeveloperRegistrationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,112 @@
+"""
+Per-request timing collected for ServerTimingMiddleware.
+
+A RequestTimer is attached to each request as ``request.server_timing`` and
+is the current timer of the request's context. record() is installed as an
+execute wrapper on every database connection (see UsersConfig.ready) and
+counts queries and their cumulative time into the current timer, whichever
+thread runs them: the request thread, Django's sync_to_async threads under
+ASGI, or the users.async_db pool. Other code adds named phases to the timer
+with add() (for example the authentication classes in users.authentication).
+"""
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import wraps
+
+_current = ContextVar('server_timing', default=None)
+
+
+class RequestTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_finished = None
+        self.phases = defaultdict(float)
+        self.queries = 0
+        self.sql_time = 0.0
+        # (sql, seconds) per query; parameters are left out so user data
+        # never reaches the logs
+        self.statements = []
+        # Async views run queries concurrently in several threads
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - began
+            with self.lock:
+                self.queries += 1
+                self.sql_time += elapsed
+                self.statements.append((sql, elapsed))
+
+
+def record(execute, sql, params, many, context):
+    """Execute wrapper that times the query into the current RequestTimer, if any."""
+    timer = _current.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver adding record() to every connection."""
+    if record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record)
+
+
+def measure(request, get_response):
+    """
+    Call ``get_response`` with a RequestTimer attached to the request and
+    recording queries. A timer already attached by an outer middleware is
+    reused, so the queries are only counted once. Returns (response, timer).
+    """
+    timer = getattr(request, 'server_timing', None)
+    if timer is not None:
+        return get_response(request), timer
+    timer = request.server_timing = RequestTimer()
+    token = _current.set(timer)
+    try:
+        return get_response(request), timer
+    finally:
+        _current.reset(token)
+
+
+async def ameasure(request, get_response):
+    """measure() for an async ``get_response``."""
+    timer = getattr(request, 'server_timing', None)
+    if timer is not None:
+        return await get_response(request), timer
+    timer = request.server_timing = RequestTimer()
+    token = _current.set(timer)
+    try:
+        return await get_response(request), timer
+    finally:
+        _current.reset(token)
+
+
+def add(request, phase, seconds):
+    """Add ``seconds`` to ``phase`` of the request's timer, if it has one."""
+    timer = getattr(getattr(request, '_request', request), 'server_timing', None)
+    if timer is not None:
+        timer.phases[phase] += seconds
+
+
+def timed(phase):
+    """
+    Method decorator that adds the method's run time to ``phase``; the first
+    argument after ``self`` must be the request.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            began = time.perf_counter()
+            try:
+                return method(self, request, *args, **kwargs)
+            finally:
+                add(request, phase, time.perf_counter() - began)
+        return wrapper
+    return decorator
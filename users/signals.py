@@ -0,0 +1,26 @@
+"""
+Signal handlers that keep the API key cache and the JWT user cache in step
+with Developer and User writes. QuerySet.update() bypasses them; callers must
+invalidate the caches themselves (see the DeveloperAdmin actions).
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .api_key_cache import api_key_cache
+from .models import Developer, User
+from .token_user_cache import token_user_cache
+
+
+@receiver(post_save, sender=Developer)
+@receiver(post_delete, sender=Developer)
+def developer_changed(sender, instance, **kwargs):
+    # Drop whatever key was cached for this developer (possibly an old one
+    # after regenerate_api_key) and any negative entry for the current key
+    api_key_cache.invalidate(developer_ids=[instance.pk], keys=[instance.api_key])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Deactivated or deleted accounts must stop authenticating at once
+    token_user_cache.invalidate([instance.pk])
@@ -0,0 +1,164 @@
+"""
+Per-developer rate limiting.
+
+Developer.requests_per_hour and requests_per_day are enforced with sliding
+window counters: each (developer, window) keeps the count of the current and
+the previous fixed window, and the previous count is weighted by how much of
+it still overlaps the sliding window. The counters live in a small SQLite
+file outside the main database (RATE_LIMIT_STORE), which every worker
+process on the host shares, so a request costs one short local transaction
+and no query against the application database. The developer itself comes
+from the API key cache.
+
+If the store cannot be reached the request is let through; rate limiting is
+a safety net, not an access control.
+"""
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = (
+    ('hour', 3600, 'requests_per_hour'),
+    ('day', 86400, 'requests_per_day'),
+)
+
+
+class SlidingWindowStore:
+    """Sliding window counters in a SQLite file shared between processes."""
+
+    def __init__(self, path, timeout=1.0):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def connection(self):
+        # One connection per thread and per process (gunicorn forks workers)
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit_windows ('
+                ' key TEXT PRIMARY KEY, bucket INTEGER NOT NULL,'
+                ' count INTEGER NOT NULL, previous INTEGER NOT NULL)'
+            )
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def hit(self, key, limits, now=None):
+        """
+        Count one request against every ``(name, seconds, limit)`` in
+        ``limits`` unless one of them is exhausted.
+        Returns ``(allowed, states)`` with one ``(name, limit, remaining,
+        reset_at, retry_after)`` state per window.
+        """
+        now = time.time() if now is None else now
+        conn = self.connection()
+        states = []
+        rows = {}
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for name, seconds, limit in limits:
+                row_key = f'{key}:{name}'
+                bucket = int(now // seconds)
+                row = conn.execute(
+                    'SELECT bucket, count, previous FROM rate_limit_windows WHERE key = ?',
+                    (row_key,)
+                ).fetchone()
+                if row is None or row[0] < bucket - 1:
+                    count, previous = 0, 0
+                elif row[0] == bucket - 1:
+                    count, previous = 0, row[1]
+                else:
+                    count, previous = row[1], row[2]
+
+                elapsed = now - bucket * seconds
+                overlap = 1 - elapsed / seconds
+                used = previous * overlap + count
+                remaining = int(limit - used)
+                retry_after = 0
+                if used + 1 > limit:
+                    if count + 1 > limit or not previous:
+                        # Even a fully expired previous window would not help
+                        retry_after = seconds - elapsed
+                    else:
+                        # Wait until enough of the previous window slides out
+                        needed = (used + 1 - limit) / previous * seconds
+                        retry_after = min(needed, seconds - elapsed)
+                states.append((name, limit, max(remaining, 0), (bucket + 1) * seconds, retry_after))
+                rows[row_key] = (bucket, count, previous)
+
+            allowed = all(state[4] == 0 for state in states)
+            if allowed:
+                conn.executemany(
+                    'INSERT INTO rate_limit_windows (key, bucket, count, previous)'
+                    ' VALUES (?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET'
+                    ' bucket = excluded.bucket, count = excluded.count,'
+                    ' previous = excluded.previous',
+                    [(row_key, bucket, count + 1, previous)
+                     for row_key, (bucket, count, previous) in rows.items()]
+                )
+                states = [
+                    (name, limit, max(remaining - 1, 0), reset_at, retry_after)
+                    for name, limit, remaining, reset_at, retry_after in states
+                ]
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, states
+
+
+store = SlidingWindowStore(
+    getattr(settings, 'RATE_LIMIT_STORE', None)
+    or os.path.join(tempfile.gettempdir(), 'fitness_tracker_ratelimit.sqlite3')
+)
+
+
+class DeveloperRateThrottle(BaseThrottle):
+    """
+    Enforce Developer.requests_per_hour and requests_per_day for API key
+    requests. Other requests are not throttled here.
+    """
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        developer = getattr(request.user, 'developer', None)
+        if developer is None or not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+            return True
+
+        limits = [
+            (name, seconds, getattr(developer, field))
+            for name, seconds, field in WINDOWS
+        ]
+        try:
+            allowed, states = store.hit(f'developer:{developer.pk}', limits)
+        except sqlite3.Error:
+            logger.exception('Rate limit store unavailable; letting the request through')
+            return True
+
+        # The tightest window is reported in the X-RateLimit-* headers
+        name, limit, remaining, reset_at, retry_after = min(states, key=lambda state: state[2])
+        request._request.rate_limit_headers = {
+            'X-RateLimit-Limit': str(limit),
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(math.ceil(reset_at)),
+            'X-RateLimit-Window': name,
+        }
+        if not allowed:
+            self.retry_after = max(state[4] for state in states)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
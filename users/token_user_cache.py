@@ -0,0 +1,81 @@
+"""
+In-process cache of the account state behind stateless JWT authentication.
+
+With JWT_STATELESS_AUTH, JWTAuthentication builds request.user from the
+token claims (users.authentication.ClaimsUser) instead of loading the User
+row on every request. Whether the account may still be used, its username
+and its token_version (see users.revocation) are read from here instead:
+one small query per user id every JWT_USER_CACHE_TTL seconds.
+
+Entries are dropped when a user is saved or deleted (see users.signals), so
+the worker that deactivates or deletes an account locks its tokens out at
+once. The cache is per process, so other workers notice within the TTL;
+keep JWT_USER_CACHE_TTL short.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from . import prometheus
+
+
+class TokenUserCache:
+    def __init__(self, max_size=10000, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            # user id -> (expires_at, (is_active, username, token_version) or None)
+            self.entries = OrderedDict()
+            # Bumped by every invalidation; a lookup that raced one is not stored
+            self.generation = getattr(self, 'generation', 0) + 1
+
+    def get(self, user_id):
+        """
+        Return ``(is_active, username, token_version)`` for ``user_id``, or
+        None if there is no such user, reading the database only on a miss.
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(user_id)
+                self.hits += 1
+                prometheus.CACHE_REQUESTS.inc('jwt_user', 'hit')
+                return entry[1]
+            self.misses += 1
+            prometheus.CACHE_REQUESTS.inc('jwt_user', 'miss')
+            generation = self.generation
+
+        state = get_user_model().objects.filter(pk=user_id).values_list(
+            'is_active', 'username', 'token_version'
+        ).first()
+
+        with self.lock:
+            if generation == self.generation:
+                self.entries[user_id] = (now + self.ttl, state)
+                self.entries.move_to_end(user_id)
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+        return state
+
+    def invalidate(self, user_ids):
+        """Drop the entries of the given user ids."""
+        with self.lock:
+            self.generation += 1
+            for user_id in user_ids:
+                self.entries.pop(user_id, None)
+
+
+token_user_cache = TokenUserCache(
+    max_size=getattr(settings, 'JWT_USER_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'JWT_USER_CACHE_TTL', 30),
+)
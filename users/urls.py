@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (
     RegisterView, ProfileView, change_password, delete_account,
+    logout, revoke_sessions,
     DeveloperRegisterView, developer_info, regenerate_api_key
 )
 
@@ -10,6 +11,8 @@ urlpatterns = [
     path('profile/', ProfileView.as_view(), name='profile'),
     path('change-password/', change_password, name='change_password'),
     path('delete-account/', delete_account, name='delete_account'),
+    path('logout/', logout, name='logout'),
+    path('revoke-sessions/', revoke_sessions, name='revoke_sessions'),
 ]
 
 
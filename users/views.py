@@ -1,19 +1,31 @@
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import Token
+import hmac
+from django.conf import settings
+from django.db.models import F
 from django.contrib.auth import get_user_model, authenticate
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
 from .serializers import (
     UserRegistrationSerializer, 
     UserSerializer, 
     UserUpdateSerializer,
     PasswordChangeSerializer,
+    LogoutSerializer,
     DeveloperRegistrationSerializer,
     DeveloperSerializer,
     APIKeyResponseSerializer
 )
+from .authentication import APIKeyAuthentication, JWTAuthentication, SessionAuthentication, user_instance
 from .models import Developer
+from .prometheus import registry
+from .revocation import RefreshToken, revoke
+from . import batch
 
 User = get_user_model()
 
@@ -41,7 +53,7 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        return user_instance(self.request.user)
     
     def update(self, request, *args, **kwargs):
         serializer = UserUpdateSerializer(
@@ -58,7 +70,7 @@ class ProfileView(generics.RetrieveUpdateAPIView):
 def change_password(request):
     serializer = PasswordChangeSerializer(data=request.data)
     if serializer.is_valid():
-        user = request.user
+        user = user_instance(request.user)
         if user.check_password(serializer.validated_data['old_password']):
             user.set_password(serializer.validated_data['new_password'])
             user.save()
@@ -73,13 +85,53 @@ def change_password(request):
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def delete_account(request):
-    user = request.user
+    user = user_instance(request.user)
     user.delete()
     return Response(
         {'message': 'Account deleted successfully'}, 
         status=status.HTTP_204_NO_CONTENT
     )
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout(request):
+    """
+    Revoke a refresh token and the access token presenting it.
+    
+    POST /api/auth/logout/
+    Body: {"refresh": "<refresh token>"}
+    """
+    serializer = LogoutSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        refresh = RefreshToken(serializer.validated_data['refresh'])
+    except TokenError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    if refresh.get(jwt_settings.USER_ID_CLAIM) != request.user.id:
+        return Response(
+            {'error': 'Refresh token belongs to another user'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    refresh.blacklist()
+    if isinstance(request.auth, Token):
+        revoke(request.auth, request.user.id)
+    return Response({'message': 'Logged out successfully'})
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def revoke_sessions(request):
+    """
+    Revoke every token issued to the user so far, on all devices.
+    
+    POST /api/auth/revoke-sessions/
+    """
+    user = user_instance(request.user)
+    user.token_version = F('token_version') + 1
+    # Also drops the user's cached token_version (users.signals)
+    user.save(update_fields=['token_version'])
+    return Response({'message': 'All sessions revoked'})
+
 # Developer API Views
 class DeveloperRegisterView(generics.CreateAPIView):
     """
@@ -131,11 +183,15 @@ def developer_info(request):
             "activities": "/api/activities/",
             "goals": "/api/activities/goals/",
             "metrics": "/api/activities/metrics/",
-            "leaderboard": "/api/activities/leaderboard/"
+            "trends": "/api/activities/trends/",
+            "leaderboard": "/api/activities/leaderboard/",
+            "sync": "/api/activities/sync/",
+            "batch": "/api/batch/"
         },
         "rate_limits": {
             "default": "1000 requests per hour",
-            "daily": "10000 requests per day"
+            "daily": "10000 requests per day",
+            "headers": "X-RateLimit-Limit, X-RateLimit-Remaining, X-RateLimit-Reset; 429 responses include Retry-After"
         },
         "support": {
             "documentation": "https://github.com/your-repo/fitness-api",
@@ -178,4 +234,51 @@ def regenerate_api_key(request):
         return Response(
             {'error': 'Invalid API key or email'}, 
             status=status.HTTP_401_UNAUTHORIZED
-        )
\ No newline at end of file
+        )
+
+@api_view(['POST'])
+@authentication_classes([JWTAuthentication, APIKeyAuthentication, SessionAuthentication])
+@permission_classes([IsAuthenticated])
+# Every sub-request is throttled (and counted) by its own view
+@throttle_classes([])
+def batch_requests(request):
+    """
+    Run several API requests in one round trip, authenticated once.
+    Body: {"requests": [{"method": "GET", "url": "/api/activities/metrics/",
+    "body": {...}, "headers": {...}}, ...], "parallel": false}
+    With parallel, consecutive GET requests run concurrently.
+    """
+    try:
+        specs = batch.parse(request.data, getattr(settings, 'BATCH_MAX_REQUESTS', 20))
+    except batch.InvalidBatch as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = batch.run(request, specs, parallel=request.data.get('parallel') is True)
+    
+    # Report the rate limit left after the last throttled sub-request
+    throttled = [result['rate_limit_headers'] for result in results if result.get('rate_limit_headers')]
+    if throttled:
+        request._request.rate_limit_headers = min(
+            throttled, key=lambda headers: int(headers['X-RateLimit-Remaining'])
+        )
+    return HttpResponse(batch.render(results), content_type='application/json')
+
+@require_GET
+def prometheus_metrics(request):
+    """
+    Prometheus text exposition of the metrics of every worker process.
+    Requires METRICS_TOKEN (Authorization: Bearer <token>); without a token
+    it is only served with DEBUG on.
+    """
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        return HttpResponse(status=404)
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token and not settings.DEBUG:
+        return HttpResponse('Set METRICS_TOKEN to serve /metrics.', status=403, content_type='text/plain')
+    if token and not hmac.compare_digest(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )